@@ -0,0 +1,526 @@
+import asyncio
+import time
+import re
+import json
+import httpx
+from dotenv import load_dotenv
+from core.http_client import request
+from core.key_pool import get_env_key
+from core.circuit_breaker import CircuitOpen
+from core.rate_limiter import get_api_key
+from core.polling import PollPolicy, default_poll_policy, record_completion
+
+
+# Load .env variables
+load_dotenv()
+
+# 🔐 ENV VARS
+NINJA_API_KEY = get_env_key("EMAIL_VERIFY_NINJA_KEY")
+EMAIL_FINDER_KEY = get_env_key("EMAIL_FINDER_KEY")
+FIND_AND_VALIDATE_EMAIL_KEY = get_env_key("EMAIL_FINDER_AND_VALIDATE_KEY")
+GOOGLE_SEARCH_API_KEY = get_env_key("GOOGLE_SEARCH_API_KEY")
+DETECT_ACTIVITY_API_KEY = get_env_key("DETECT_ACTIVITY_API_KEY")
+
+# State (per-process)
+# Key of the pool each search was submitted with; its status and results are asked for with the same key.
+# Kept until the search is forgotten (results processed or search dropped)
+_search_keys = {}
+
+
+def get_search_key(request_id):
+    return _search_keys.get(str(request_id))
+
+
+def restore_search_key(request_id, api_key):
+    """
+    Use `api_key` for a search submitted by an earlier run (re-attached after a restart).
+    """
+    if api_key:
+        _search_keys[str(request_id)] = api_key
+
+
+def forget_search_key(request_id):
+    _search_keys.pop(str(request_id), None)
+
+
+class ApiError(Exception):
+    pass
+
+
+class NotFound(dict):
+    """
+    Empty result for a lookup the provider answered but has no record for.
+    Behaves exactly like {} for callers; lets caches tell it apart from a failed call.
+    """
+    pass
+
+
+async def get_company_by_domain(rapidapi_key, domain):
+    """
+    Get company info from API using company domain.
+    """
+    url = "https://web-scraping-api2.p.rapidapi.com/get-company-by-domain"
+    querystring = {'domain': domain}
+    headers = {
+        'x-rapidapi-key': rapidapi_key,
+        'x-rapidapi-host': 'web-scraping-api2.p.rapidapi.com'
+    }
+
+    try:
+        response = await request("GET", url, headers=headers, params=querystring)
+
+        if response.status_code == 429:
+            return "No more credits for domain API"
+        if response.status_code == 403:
+            return "Subscription is suspended"
+        if response.status_code == 200:
+            return response.json().get('data') or NotFound()
+        if response.status_code == 404:
+            return NotFound()
+        else:
+            print(f"Domain API request failed: {response.status_code} {response.text}", flush=True)
+            return {}
+    except CircuitOpen:
+        raise
+    except Exception as e:
+        print(f"Error fetching company data by domain: {e}", flush=True)
+        return {}
+
+
+async def search_leads(rapidapi_key, payload):
+
+    url = "https://web-scraping-api2.p.rapidapi.com/search-leads"
+
+    headers = {
+        "x-rapidapi-key": rapidapi_key,
+        "x-rapidapi-host": "web-scraping-api2.p.rapidapi.com",
+        "Content-Type": "application/json"
+    }
+
+    try:
+        response = await request("POST", url, json=payload, headers=headers, coalesce=False)
+        if response.status_code == 429:
+            print(response.status_code, response.text, flush=True)
+            raise ApiError("No request id for API")
+        if response.status_code == 200:
+            request_id = response.json().get('request_id', {})
+            if request_id:
+                _search_keys[str(request_id)] = get_api_key(response.request.headers)
+            return request_id
+        else:
+            print(f"Get request id API request failed: {response.status_code} {response.text}", flush=True)
+            return {}
+    except CircuitOpen:
+        raise
+    except Exception as e:
+        print(f"Error fetching request id: {e}", flush=True)
+        return {}
+
+
+async def check_search_status(rapidapi_key, request_id):
+
+    url = "https://web-scraping-api2.p.rapidapi.com/check-search-status"
+
+    querystring = {"request_id": request_id}
+
+    headers = {
+        "x-rapidapi-key": get_search_key(request_id) or rapidapi_key,
+        "x-rapidapi-host": "web-scraping-api2.p.rapidapi.com"
+    }
+
+    try:
+        response = await request("GET", url, headers=headers, params=querystring, rotate_key=False)
+        if response.status_code == 429:
+            print(response.status_code, response.text, flush=True)
+            raise ApiError("No request id for API")
+        if response.status_code == 200:
+            return response.json()
+        else:
+            print(f"Get request id API request failed: {response.status_code} {response.text}", flush=True)
+            return {}
+    except CircuitOpen:
+        raise
+    except Exception as e:
+        print(f"Error fetching request id: {e}", flush=True)
+        return {}
+
+
+async def wait_for_results(rapidapi_key, request_id, delay=None, max_retries=None, policy=None):
+    """
+    Poll check_search_status until the search is done.
+    Uses `policy` if given, the old fixed schedule if `delay`/`max_retries` are
+    given, else the adaptive default tuned from past searches.
+    """
+    if policy is None:
+        if delay is not None and max_retries is not None:
+            policy = PollPolicy.fixed(delay, max_retries)
+        else:
+            policy = default_poll_policy()
+
+    started_at = time.monotonic()
+    delays = policy.delays()
+    attempt = 0
+
+    while True:
+        attempt += 1
+        status_response = await check_search_status(rapidapi_key, request_id)
+
+        status = status_response.get("status")
+        print(f"Attempt {attempt}: Status = {status}", flush=True)
+
+        if status == "done":
+            print("✅ Search completed.")
+            record_completion(time.monotonic() - started_at)
+            return status_response
+        elif status == "failed":
+            raise Exception("❌ Search failed.")
+        elif status == "pending" or status == "processing":
+            next_delay = next(delays, None)
+            if next_delay is None:
+                break
+            await asyncio.sleep(next_delay)
+        else:
+            print(f"⚠️ Unexpected status: {status}")
+            break
+
+    timeout_result = {
+        "status": "Search did not complete in time."
+    }
+
+    return timeout_result
+
+
+async def get_search_results(rapidapi_key, request_id, page=1):
+
+    url = "https://web-scraping-api2.p.rapidapi.com/get-search-results"
+
+    querystring = {"request_id": request_id,"page": str(page)}
+
+    headers = {
+        "x-rapidapi-key": get_search_key(request_id) or rapidapi_key,
+        "x-rapidapi-host": "web-scraping-api2.p.rapidapi.com"
+    }
+
+    try:
+        response = await request("GET", url, headers=headers, params=querystring, rotate_key=False)
+        if response.status_code == 429:
+            print(response.status_code, response.text, flush=True)
+            raise ApiError("No results for API")
+        if response.status_code == 200:
+            return response.json()
+        else:
+            print(f"Get request id API request failed: {response.status_code} {response.text}", flush=True)
+            return {}
+    except CircuitOpen:
+        raise
+    except Exception as e:
+        print(f"Error fetching request id: {e}", flush=True)
+        return {}
+
+
+async def find_email(person_data):
+    """
+    Safely find email for a lead using the RapidAPI Email Finder service.
+    Handles invalid responses, timeouts, and inconsistent API structures.
+    Returns NotFound() when the finder answered without an email; None (or
+    the status code) when the call failed, which must not be cached.
+    """
+
+    url = "https://email-finder7.p.rapidapi.com/email-address/find-one/"
+
+    first_name = person_data.get("first_name", "").strip()
+    last_name = person_data.get("last_name", "").strip()
+    domain = person_data.get("domain", "").strip()
+
+    # --- Clean name and domain ---
+    suffixes = [
+        "CPA", "MD", "PhD", "JD", "RN", "CEO", "CFO", "COO", "CTO", "PMP",
+        "CFA", "CFE", "CFI", "CISA", "CMA", "CSM", "Esq.", "DDS", "DO", "DVM",
+        "MBA", "BSc", "MSc", "Eng.", "LLM", "ACCA", "CA", "NP", "PA", "RPh",
+        "CRC", "CHRP", "MCSE", "AWS", "GCP", "CISSP"
+    ]
+    suffix_pattern = r'(\s*,\s*|\s+)?(' + '|'.join(r'\b' + re.escape(s) + r'\b' for s in suffixes) + r')(\s*,\s*|\s+)?'
+
+    domain = re.sub(r'^(https?://)?(www\.)?', '', domain).rstrip('/')
+
+    if first_name and not re.fullmatch(r'\b(' + '|'.join(re.escape(s) for s in suffixes) + r')\b', first_name, flags=re.IGNORECASE):
+        first_name = re.sub(suffix_pattern, '', first_name, flags=re.IGNORECASE).strip()
+    if last_name and not re.fullmatch(r'\b(' + '|'.join(re.escape(s) for s in suffixes) + r')\b', last_name, flags=re.IGNORECASE):
+        last_name = re.sub(suffix_pattern, '', last_name, flags=re.IGNORECASE).strip()
+
+    payload = {
+        "personFirstName": first_name,
+        "personLastName": last_name,
+        "domain": domain
+    }
+
+    headers = {
+        "x-rapidapi-key": EMAIL_FINDER_KEY,
+        "x-rapidapi-host": "email-finder7.p.rapidapi.com"
+    }
+
+    try:
+        response = await request("GET", url, headers=headers, params=payload, timeout=10)
+
+        # --- Handle known HTTP errors ---
+        if response.status_code == 429:
+            print("❌ Too Many Requests (429)")
+            return 429
+
+        if response.status_code == 522:
+            print("❌ Server error (522)")
+            return 522
+
+        # --- Only parse JSON if 200 ---
+        if response.status_code == 200:
+            try:
+                json_response = response.json()
+            except ValueError:
+                print("❌ Invalid JSON in response")
+                return None
+
+            # Handle all safe cases
+            if not isinstance(json_response, dict):
+                return None
+
+            payload = json_response.get("payload", {})
+            if not isinstance(payload, dict):
+                return None
+
+            data = payload.get("data")
+            if not data:
+                return NotFound()
+
+            return data
+
+        return None
+
+    except httpx.TimeoutException:
+        print("⏰ Request timed out")
+        return None
+
+    except httpx.HTTPError as e:
+        print(f"🌐 Request failed: {e}")
+        return None
+
+
+async def verify_email(rapidapi_key, email):
+
+    url = "https://validect-email-verification-v1.p.rapidapi.com/v1/verify"
+
+    querystring = {"email": email}
+    headers = {
+        "x-rapidapi-key": rapidapi_key,
+        "x-rapidapi-host": "validect-email-verification-v1.p.rapidapi.com"
+    }
+
+    try:
+        response = await request("GET", url, headers=headers, params=querystring)
+        if response.status_code == 429:
+            print(response.status_code, response.text, flush=True)
+            raise ApiError("No results for API")
+        if response.status_code == 200:
+            return response.json()
+        else:
+            print(f"Get request id API request failed: {response.status_code} {response.text}", flush=True)
+            return {}
+    except CircuitOpen:
+        raise
+    except Exception as e:
+        print(f"Error fetching request id: {e}", flush=True)
+        return {}
+
+
+async def find_and_validate_email(person_data):
+    """
+    Find and validate email for lead.
+    """
+    url = "https://email-finder11.p.rapidapi.com/v2/email/finder"
+    api_key = FIND_AND_VALIDATE_EMAIL_KEY
+
+    person_name = person_data["query"].strip()
+    company_name = person_data["company_name"].strip()
+    company_domain = person_data["company_domain"].strip()
+
+    payload = {
+        "query": person_name,
+        "company_name": company_name,
+        "company_domain": company_domain
+    }
+
+    headers = {
+        "x-rapidapi-key": api_key,
+        "x-rapidapi-host": "email-finder11.p.rapidapi.com"
+    }
+
+    try:
+        response = await request("GET", url, headers=headers, params=payload)
+
+        # 👉 Check for 429 BEFORE raise_for_status
+        if response.status_code == 429:
+            print("❌ 429 Too Many Requests")
+            return 429
+        if response.status_code == 403:
+            print("❌ 403 Too Many Requests")
+            return 403
+
+        if not response.text:
+            print(f"API Error: Empty response. Status: {response.status_code}, Payload: {payload}")
+            return {}
+
+    except httpx.HTTPError as e:
+        print(f"🌐 Request failed: {e}")
+        return None
+
+
+async def get_revenue(company):
+    """
+    Get revenue of company via google search (scrape from zoominfo.com/).
+    Returns (revenue, prooflink); NotFound() when the search has no revenue,
+    None when the call failed, which must not be cached.
+    """
+    headers = {"X-API-KEY": GOOGLE_SEARCH_API_KEY, "Content-Type": "application/json"}
+
+    query = f"site:zoominfo.com/c {company} revenue"
+
+    try:
+        res = await request(
+            "POST",
+            "https://google.serper.dev/search",
+            headers=headers,
+            json={"q": query}
+        )
+        if res.status_code != 200:
+            print(f"Revenue search failed: {res.status_code} {res.text}", flush=True)
+            return None
+
+        data = res.json()
+
+    except httpx.HTTPError as e:
+        print(f"🌐 Revenue search failed: {e}", flush=True)
+        return None
+
+    except ValueError:
+        print("❌ Invalid JSON in revenue search response", flush=True)
+        return None
+
+    if not isinstance(data, dict) or "organic" not in data:
+        return NotFound()
+
+    for item in data["organic"]:
+        snippet = item.get("snippet", "")
+
+        # Match "revenue <5M", "revenue < $5 million", or "revenue less than $5M"
+        less_match = re.search(
+            r"revenue[^$0-9<]{0,10}(?:<|less\s+than)\s*(\$?\s*[0-9,.]+(?:\s?(?:million|billion|trillion|m|bn|b))?)",
+            snippet,
+            re.I
+        )
+        if less_match:
+            value = less_match.group(1).strip()
+            return f"less {value}", item.get("link")
+
+        # Normal case like "revenue $5 million"
+        match = re.search(
+            r"revenue[^$0-9]{0,10}(\$?\s*[0-9,.]+(?:\s?(?:million|billion|trillion|m|bn|b))?)",
+            snippet,
+            re.I
+        )
+        if match:
+            return match.group(1).strip(), item.get("link")
+
+    return NotFound()
+
+
+async def get_profile_activity(linkedin_url):
+    """
+    Get profile activity from API using url.
+    """
+    url = "https://web-scraping-api2.p.rapidapi.com/get-profile-recent-activity-time"
+
+    querystring = {
+        'linkedin_url': linkedin_url
+    }
+
+    headers = {
+        'x-rapidapi-key': DETECT_ACTIVITY_API_KEY,
+        "X-RapidAPI-Host": "web-scraping-api2.p.rapidapi.com"
+    }
+
+    try:
+        response = await request("GET", url, headers=headers, params=querystring)
+
+        if response.status_code == 429:
+            return "No more credits for domain API"
+        if response.status_code == 403:
+            return "Subscription is suspended"
+        if response.status_code == 200:
+            return response.json().get('data', {})
+        else:
+            print(f"Domain API request failed: {response.status_code} {response.text}", flush=True)
+            return {}
+    except CircuitOpen:
+        raise
+    except Exception as e:
+        print(f"Error fetching company data by domain: {e}", flush=True)
+        return {}
+
+
+async def get_search_results_by_serper(company_name, location="us"):
+
+    url = "https://google.serper.dev/search"
+
+    payload = json.dumps({
+        "q": f"(site:linkedin.com/company OR site:linkedin.com/school OR site:linkedin.com/showcase) {company_name} industry size",
+        "gl": location,
+        })
+    headers = {
+        'X-API-KEY': GOOGLE_SEARCH_API_KEY,
+        'Content-Type': 'application/json'
+    }
+
+    try:
+        response = await request("POST", url, headers=headers, content=payload)
+    except httpx.HTTPError as e:
+        print(f"🌐 Company search failed: {e}", flush=True)
+        return None
+
+    if response.status_code != 200:
+        print(f"Company search failed: {response.status_code} {response.text}", flush=True)
+        return None
+
+    return response.text
+
+
+async def get_company_info_from_prooflink(api_key, linkedin_url):
+    """
+    Get company domain using linkedin url.
+    """
+    url = "https://web-scraping-api2.p.rapidapi.com/get-company-by-url"
+
+    querystring = {
+        'linkedin_url': linkedin_url
+    }
+
+    headers = {
+        "x-rapidapi-key": api_key,
+        "x-rapidapi-host": "web-scraping-api2.p.rapidapi.com"
+    }
+
+    try:
+        response = await request("GET", url, headers=headers, params=querystring)
+
+        if response.status_code == 429:
+            return "No more credits for domain API"
+        if response.status_code == 403:
+            return "Subscription is suspended"
+        if response.status_code == 200:
+            return response.json().get('data', {})
+        else:
+            print(f"Domain API request failed: {response.status_code} {response.text}", flush=True)
+            return {}
+    except CircuitOpen:
+        raise
+    except Exception as e:
+        print(f"Error fetching company data by domain: {e}", flush=True)
+        return {}
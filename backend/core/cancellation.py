@@ -0,0 +1,128 @@
+import os
+import time
+import threading
+import concurrent.futures
+from typing import Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+from models import SessionLocal, ProcessEntry
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+# How often blocking waits wake up to check for a stop
+CANCEL_POLL_SECONDS = float(os.getenv("CANCEL_POLL_SECONDS", "0.5"))
+# How often the stop flag is read from the DB, for stops sent to another process
+STOP_DB_POLL_SECONDS = float(os.getenv("STOP_DB_POLL_SECONDS", "5"))
+
+
+class Cancelled(Exception):
+    """
+    The entry was stopped while we were waiting.
+    """
+    pass
+
+
+class CancellationToken:
+    """
+    Stop signal for one entry's run.
+
+    /stop sets the event directly when the entry runs in this process; the
+    DB flag (ProcessEntry.is_stopped) is read at most every STOP_DB_POLL_SECONDS
+    as a fallback for runs in other processes. Blocking waits go through wait()
+    / wait_any(), which wake up every CANCEL_POLL_SECONDS to check the token.
+    """
+
+    def __init__(self, entry_id: Optional[str] = None):
+        self.entry_id = entry_id
+        self._event = threading.Event()
+        self._db_checked_at = time.monotonic()
+
+    def cancel(self):
+        self._event.set()
+
+    def _read_stop_flag(self) -> bool:
+        db = SessionLocal()
+        try:
+            return bool(db.query(ProcessEntry.is_stopped).filter_by(id=self.entry_id).scalar())
+        finally:
+            db.close()
+
+    def is_cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+
+        if self.entry_id is not None and time.monotonic() - self._db_checked_at >= STOP_DB_POLL_SECONDS:
+            self._db_checked_at = time.monotonic()
+            if self._read_stop_flag():
+                self._event.set()
+
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self.is_cancelled():
+            raise Cancelled(f"Entry {self.entry_id} was stopped")
+
+    def wait(self, future: concurrent.futures.Future):
+        """
+        future.result(), giving up (and cancelling the future) once the token is cancelled.
+        """
+        while True:
+            try:
+                self.raise_if_cancelled()
+                return future.result(timeout=CANCEL_POLL_SECONDS)
+            except concurrent.futures.TimeoutError:
+                continue
+            except Cancelled:
+                future.cancel()
+                raise
+
+    def wait_any(self, futures: Iterable[concurrent.futures.Future]):
+        """
+        Block until one of `futures` is done; raises Cancelled (the futures are left to the caller).
+        """
+        futures = list(futures)
+        while True:
+            self.raise_if_cancelled()
+            done, _ = concurrent.futures.wait(futures, timeout=CANCEL_POLL_SECONDS, return_when=concurrent.futures.FIRST_COMPLETED)
+            if done:
+                return done
+
+
+# State (per-process)
+# An entry can have several runs in one process (workers joining it)
+_tokens: Dict[str, List[CancellationToken]] = {}
+_tokens_lock = threading.Lock()
+
+
+def get_cancellation_token(entry_id: str) -> CancellationToken:
+    """
+    A fresh token for a run of the entry.
+    """
+    with _tokens_lock:
+        token = CancellationToken(entry_id)
+        _tokens.setdefault(entry_id, []).append(token)
+        return token
+
+
+def release_cancellation_token(entry_id: str, token: CancellationToken):
+    with _tokens_lock:
+        tokens = _tokens.get(entry_id, [])
+        if token in tokens:
+            tokens.remove(token)
+        if not tokens:
+            _tokens.pop(entry_id, None)
+
+
+def cancel_entry(entry_id: str) -> bool:
+    """
+    Stop the entry's runs in this process, if any.
+    """
+    with _tokens_lock:
+        tokens = list(_tokens.get(entry_id, []))
+    for token in tokens:
+        token.cancel()
+    return bool(tokens)
@@ -0,0 +1,238 @@
+import os
+import time
+import asyncio
+import threading
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import SessionLocal, ProcessEntry
+from core import metrics
+from core.scheduler import current_entry
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+# Failed (5xx, connection error, timeout) or slow calls in a row that open an endpoint's breaker
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+# A call answering slower than this counts as failed
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "20"))
+# How long an open breaker fails calls at once before letting a probe through
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_ENABLED = os.getenv("BREAKER_ENABLED", "true").lower() == "true"
+# Least time a parked call waits before trying its endpoint again
+BREAKER_PARK_RETRY_SECONDS = float(os.getenv("BREAKER_PARK_RETRY_SECONDS", "1"))
+# A call parked longer than this gives up with CircuitOpen (and fails its run); 0 waits as long as it takes
+BREAKER_PARK_MAX_SECONDS = float(os.getenv("BREAKER_PARK_MAX_SECONDS", "0"))
+
+
+class CircuitOpen(Exception):
+    """
+    Raised instead of calling a provider endpoint whose breaker is open.
+    """
+
+    def __init__(self, endpoint: str, failures: int, retry_in: float):
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+        self.failures = failures
+        super().__init__(
+            f"Provider {endpoint} is unavailable (circuit open after {failures} failed or slow calls, "
+            f"next probe in {retry_in:.0f}s). Unfinished items are kept; resume the entry to continue."
+        )
+
+
+class CircuitBreaker:
+    """
+    Breaker for one provider endpoint (host and path).
+
+    "closed": calls go through; BREAKER_FAILURE_THRESHOLD failed or slow
+    calls in a row open it. "open": calls raise CircuitOpen at once for
+    BREAKER_OPEN_SECONDS. "half_open": a single probe call is let through
+    (the others still fail fast); it closes the breaker if it succeeds and
+    opens it again if not.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Raise CircuitOpen unless a call may be sent now.
+        """
+        with self._lock:
+            if self.state == "open":
+                retry_in = self.opened_at + BREAKER_OPEN_SECONDS - time.monotonic()
+                if retry_in > 0:
+                    raise CircuitOpen(self.endpoint, self.failures, retry_in)
+                self.state = "half_open"
+
+            if self.state == "half_open":
+                if self._probing:
+                    raise CircuitOpen(self.endpoint, self.failures, 0)
+                self._probing = True
+
+    def record(self, ok: bool, elapsed: float) -> bool:
+        """
+        Count a finished call; returns True when it opened the breaker.
+        """
+        failed = not ok or elapsed > BREAKER_SLOW_CALL_SECONDS
+        with self._lock:
+            if self.state == "half_open":
+                self._probing = False
+                if not failed:
+                    self.state = "closed"
+                    self.failures = 0
+                    print(f"🔌 Breaker of {self.endpoint} closed, probe succeeded", flush=True)
+                    return False
+                self.failures += 1
+                return self._open()
+
+            if not failed:
+                self.failures = 0
+                return False
+
+            self.failures += 1
+            if self.state == "closed" and self.failures >= BREAKER_FAILURE_THRESHOLD:
+                return self._open()
+            return False
+
+    def abandon(self):
+        """
+        A call let through was cancelled before it finished; let the next probe go.
+        """
+        with self._lock:
+            self._probing = False
+
+    def _open(self) -> bool:
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        print(f"🔌 Breaker of {self.endpoint} open after {self.failures} failed or slow calls", flush=True)
+        return True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = max(0.0, self.opened_at + BREAKER_OPEN_SECONDS - time.monotonic()) if self.state == "open" else 0.0
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "times_opened": self.times_opened,
+                "retry_in": round(retry_in, 1),
+            }
+
+
+# State (per-process)
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+# Calls of each entry waiting for an open breaker, and the error_message shown meanwhile
+_parked: Counter = Counter()
+_parked_messages: Dict[str, str] = {}
+_parked_lock = threading.Lock()
+
+
+def get_breaker(host: str, path: str) -> Optional[CircuitBreaker]:
+    """
+    The breaker of the endpoint; None when breakers are turned off.
+    """
+    if not BREAKER_ENABLED:
+        return None
+
+    endpoint = f"{host}{path.rstrip('/')}"
+    with _breakers_lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = CircuitBreaker(endpoint)
+            _breakers[endpoint] = breaker
+    return breaker
+
+
+def get_breaker_states() -> Dict[str, dict]:
+    """
+    State of every endpoint called by this process.
+    """
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.endpoint: breaker.snapshot() for breaker in breakers}
+
+
+def _set_parked_message(entry_id: str, message: str, replaces: Optional[str] = None):
+    """
+    Show `message` as the entry's error_message; with `replaces`, only if that is still shown.
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(ProcessEntry).filter(ProcessEntry.id == entry_id)
+        if replaces is not None:
+            query = query.filter(ProcessEntry.error_message == replaces)
+        query.update({"error_message": message}, synchronize_session=False)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"⚠️ Breaker state not shown on entry {entry_id}: {e}", flush=True)
+    finally:
+        db.close()
+
+
+def _park(entry_id: Optional[str], error: CircuitOpen):
+    if entry_id is None:
+        return
+    metrics.increment(entry_id, "parked_calls")
+    with _parked_lock:
+        _parked[entry_id] += 1
+        if _parked[entry_id] > 1:
+            return
+        message = (
+            f"Waiting for provider {error.endpoint} (circuit open after {error.failures} failed or slow calls); "
+            f"affected items are parked until it recovers."
+        )
+        _parked_messages[entry_id] = message
+    asyncio.get_running_loop().run_in_executor(None, _set_parked_message, entry_id, message)
+
+
+def _unpark(entry_id: Optional[str]):
+    if entry_id is None:
+        return
+    with _parked_lock:
+        _parked[entry_id] -= 1
+        if _parked[entry_id] > 0:
+            return
+        del _parked[entry_id]
+        message = _parked_messages.pop(entry_id, None)
+    if message:
+        asyncio.get_running_loop().run_in_executor(None, _set_parked_message, entry_id, "", message)
+
+
+async def park_while_open(call: Callable[[], Awaitable]):
+    """
+    Await `call()`; while the endpoint it hits has an open breaker, wait for the
+    next probe and call again, instead of failing the item. Parked calls of an
+    entry are counted ("parked_calls") and the breaker is shown in its
+    error_message until they get through. Stopping the entry cancels them;
+    BREAKER_PARK_MAX_SECONDS, if set, makes them give up with CircuitOpen.
+    """
+    entry_id = current_entry.get()
+    parked_at = None
+    try:
+        while True:
+            try:
+                return await call()
+            except CircuitOpen as e:
+                if parked_at is None:
+                    parked_at = time.monotonic()
+                    _park(entry_id, e)
+                elif BREAKER_PARK_MAX_SECONDS and time.monotonic() - parked_at > BREAKER_PARK_MAX_SECONDS:
+                    raise
+                await asyncio.sleep(max(e.retry_in, BREAKER_PARK_RETRY_SECONDS))
+    finally:
+        if parked_at is not None:
+            _unpark(entry_id)
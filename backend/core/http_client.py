@@ -0,0 +1,252 @@
+import os
+import time
+import asyncio
+import threading
+import weakref
+import concurrent.futures
+from urllib.parse import urlsplit
+
+import httpx
+from dotenv import load_dotenv
+from core.rate_limiter import (
+    RATE_LIMIT_MAX_RETRIES,
+    RATE_LIMIT_MAX_BACKOFF_SECONDS,
+    get_rate_limiter,
+    get_api_key,
+    get_retry_after,
+    is_quota_exhausted,
+)
+from core.scheduler import bind_entry, current_entry, get_fair_queue
+from core.key_pool import KEY_EXHAUSTED_COOLDOWN_SECONDS, KEY_SUSPENDED_COOLDOWN_SECONDS, get_key_pool, with_api_key
+from core.circuit_breaker import BREAKER_SLOW_CALL_SECONDS, CircuitOpen, get_breaker
+from core.single_flight import SINGLE_FLIGHT_ENABLED, flight_key, share
+from core import metrics
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+# Max connections held open per host (one pool per RapidAPI / Serper host we talk to)
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+# Seconds an idle keep-alive connection is kept before being dropped
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+# Default request timeout in seconds, so a hung provider call fails and counts against its breaker
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", str(BREAKER_SLOW_CALL_SECONDS)))
+
+# State (per-process)
+# Clients are bound to the event loop they were created on, so they are kept per loop and per host
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _build_client() -> httpx.AsyncClient:
+    """
+    Build a client with its own keep-alive pool for a single host.
+    """
+    limits = httpx.Limits(
+        max_connections=HTTP_POOL_MAXSIZE,
+        max_keepalive_connections=HTTP_POOL_MAXSIZE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(HTTP_TIMEOUT))
+
+
+def _get_client(host: str) -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    host_clients = _clients.setdefault(loop, {})
+    client = host_clients.get(host)
+    if client is None or client.is_closed:
+        client = _build_client()
+        host_clients[host] = client
+    return client
+
+
+async def request(method: str, url: str, *, rotate_key: bool = True, coalesce: bool = True, **kwargs) -> httpx.Response:
+    """
+    Send a request through the pooled client for the url's host.
+    Every provider call in api_calls_async.py goes through here, so this is
+    also where per-provider rate limits and 429 retries are applied, and where
+    the entries sharing a provider key take turns (core/scheduler.py).
+
+    Identical calls in flight at the same time (same endpoint, params and
+    account, from any entry or lead) share one request and its response
+    (core/single_flight.py).
+    `coalesce=False` for calls that create something (a search) and must be sent each time.
+    """
+    key = flight_key(method, url, kwargs, rotate_key) if SINGLE_FLIGHT_ENABLED and coalesce else None
+    if key is None:
+        return await _send(method, url, rotate_key=rotate_key, **kwargs)
+    return await share(key, lambda: _send(method, url, rotate_key=rotate_key, **kwargs))
+
+
+async def _send(method: str, url: str, *, rotate_key: bool = True, **kwargs) -> httpx.Response:
+    """
+    One provider call, retried on throttling as needed.
+
+    Each attempt goes through the endpoint's circuit breaker
+    (core/circuit_breaker.py): while it is open, CircuitOpen is raised at once
+    instead of waiting on a degraded provider.
+
+    When the header's key is part of a pool (core/key_pool.py), each attempt
+    is sent with a key from the pool instead, and a key that is out of
+    credits, suspended or throttled is swapped for the next healthy one.
+    `rotate_key=False` keeps the given key (calls tied to it, e.g. a search's
+    status and results).
+    """
+    # requests silently dropped None values (e.g. an unset API key); httpx rejects them
+    for key in ("headers", "params"):
+        if kwargs.get(key):
+            kwargs[key] = {k: v for k, v in kwargs[key].items() if v is not None}
+
+    host = urlsplit(url).netloc
+    client = _get_client(host)
+    headers = kwargs.get("headers") or {}
+    pool = get_key_pool(get_api_key(headers)) if rotate_key else None
+    breaker = get_breaker(host, urlsplit(url).path)
+
+    attempt = 0
+    while True:
+        api_key = get_api_key(headers)
+        if pool is not None:
+            api_key = pool.acquire(host)
+            kwargs["headers"] = with_api_key(headers, api_key)
+
+        limiter = get_rate_limiter(host, api_key)
+        try:
+            _check_breaker(breaker)
+            try:
+                await get_fair_queue(limiter).acquire(current_entry.get())
+            except asyncio.CancelledError:
+                if breaker is not None:
+                    breaker.abandon()
+                raise
+
+            started_at = time.monotonic()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except asyncio.CancelledError:
+                if breaker is not None:
+                    breaker.abandon()
+                raise
+            except Exception:
+                _record_call(breaker, False, time.monotonic() - started_at)
+                raise
+            _record_call(breaker, response.status_code < 500, time.monotonic() - started_at)
+        finally:
+            if pool is not None:
+                pool.release(api_key)
+        limiter.apply_headers(response.headers)
+
+        # Suspended subscription: only another key can help
+        if response.status_code == 403 and pool is not None:
+            pool.mark_unavailable(host, api_key, KEY_SUSPENDED_COOLDOWN_SECONDS, "suspended")
+            if pool.has_available(host):
+                _count_key_failover()
+                continue
+            return response
+
+        if response.status_code != 429:
+            limiter.on_success()
+            return response
+
+        # Throttled: queue behind the limiter and send again, unless waiting can't help
+        if is_quota_exhausted(response):
+            if pool is not None:
+                pool.mark_unavailable(host, api_key, KEY_EXHAUSTED_COOLDOWN_SECONDS, "out of credits")
+                if pool.has_available(host):
+                    _count_key_failover()
+                    continue
+            return response
+
+        retry_after = get_retry_after(response)
+        delay = limiter.on_throttled(retry_after, attempt)
+        switch_key = pool is not None and pool.has_available(host, exclude=api_key)
+        if pool is not None:
+            pool.mark_unavailable(host, api_key, delay, "throttled")
+
+        if attempt >= RATE_LIMIT_MAX_RETRIES or (retry_after is not None and retry_after > RATE_LIMIT_MAX_BACKOFF_SECONDS and not switch_key):
+            return response
+
+        if switch_key:
+            print(f"⏳ 429 from {host}, retrying with another key (attempt {attempt + 1})", flush=True)
+            _count_key_failover()
+        else:
+            print(f"⏳ 429 from {host}, retrying in {delay:.1f}s (attempt {attempt + 1})", flush=True)
+        attempt += 1
+
+
+def _check_breaker(breaker):
+    if breaker is None:
+        return
+    try:
+        breaker.before_call()
+    except CircuitOpen:
+        entry_id = current_entry.get()
+        if entry_id is not None:
+            metrics.increment(entry_id, "breaker_fast_fails")
+        raise
+
+
+def _record_call(breaker, ok: bool, elapsed: float):
+    if breaker is None:
+        return
+    entry_id = current_entry.get()
+    if breaker.record(ok, elapsed) and entry_id is not None:
+        metrics.increment(entry_id, "breakers_opened")
+
+
+def _count_key_failover():
+    entry_id = current_entry.get()
+    if entry_id is not None:
+        metrics.increment(entry_id, "api_key_failovers")
+
+
+async def aclose_clients():
+    """
+    Close the clients opened on the running loop and drop their pooled connections.
+    """
+    host_clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in host_clients.values():
+        await client.aclose()
+
+
+def get_provider_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the background loop that serves the sync wrappers, starting it on first use.
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="provider-loop", daemon=True)
+                thread.start()
+                _loop = loop
+    return _loop
+
+
+def submit(coro) -> concurrent.futures.Future:
+    """
+    Start a coroutine on the shared background loop without waiting for it.
+    The caller's entry (core.scheduler.current_entry) goes along, so its
+    provider calls are scheduled as that entry's.
+    """
+    return asyncio.run_coroutine_threadsafe(bind_entry(current_entry.get(), coro), get_provider_loop())
+
+
+def run_sync(coro):
+    """
+    Run a coroutine on the shared background loop and block until it finishes.
+    Lets sync code (worker threads) share one loop and one set of connection pools.
+    """
+    loop = get_provider_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() called from the provider loop; await the coroutine instead")
+    return submit(coro).result()
@@ -0,0 +1,167 @@
+import os
+import time
+import hashlib
+import itertools
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+# How keys of a pool are handed out: "round_robin" or "least_used" (fewest calls in flight, then fewest sent)
+KEY_POOL_STRATEGY = os.getenv("KEY_POOL_STRATEGY", "round_robin")
+# How long a key whose credits ran out (quota 429) is left out of its pool
+KEY_EXHAUSTED_COOLDOWN_SECONDS = float(os.getenv("KEY_EXHAUSTED_COOLDOWN_SECONDS", "3600"))
+# How long a key whose subscription is suspended (403) is left out of its pool
+KEY_SUSPENDED_COOLDOWN_SECONDS = float(os.getenv("KEY_SUSPENDED_COOLDOWN_SECONDS", "21600"))
+# Provider keys that may hold a comma separated pool of keys, e.g. RAPIDAPI_KEY="key1,key2,key3"
+KEY_POOL_ENV_VARS = [
+    "RAPIDAPI_KEY",
+    "RAPIDAPI_KEY_VERIFY",
+    "EMAIL_FINDER_KEY",
+    "EMAIL_FINDER_AND_VALIDATE_KEY",
+    "EMAIL_VERIFY_NINJA_KEY",
+    "GOOGLE_SEARCH_API_KEY",
+    "DETECT_ACTIVITY_API_KEY",
+]
+
+
+class KeyPool:
+    """
+    The API keys (subscriptions) bought for one provider.
+
+    Every call picks a key, round-robin or least-used. Health is tracked per
+    provider host and key, since a RapidAPI key holds one subscription per API:
+    a key out of credits or suspended is left out for a long cooldown, a
+    throttled one until its Retry-After. When no key is healthy, the one
+    available soonest is used, so the provider's answer reaches the caller as
+    it did with a single key.
+    """
+
+    def __init__(self, name: str, keys: List[str], strategy: str = KEY_POOL_STRATEGY):
+        if strategy not in ("round_robin", "least_used"):
+            raise ValueError(f"Unknown key pool strategy: {strategy}")
+        self.name = name
+        self.keys = keys
+        self.strategy = strategy
+        self._unavailable_until: Dict[Tuple[str, str], float] = {}
+        self._in_flight: Counter = Counter()
+        self._sent: Counter = Counter()
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def _is_available(self, host: str, key: str, now: float) -> bool:
+        return self._unavailable_until.get((host, key), 0.0) <= now
+
+    def acquire(self, host: str) -> str:
+        """
+        Pick the key for a call to `host`; hand it back with release().
+        """
+        with self._lock:
+            now = time.monotonic()
+            healthy = [key for key in self.keys if self._is_available(host, key, now)]
+
+            if not healthy:
+                key = min(self.keys, key=lambda k: self._unavailable_until.get((host, k), 0.0))
+            elif self.strategy == "least_used":
+                key = min(healthy, key=lambda k: (self._in_flight[k], self._sent[k]))
+            else:
+                start = next(self._next) % len(self.keys)
+                ordered = self.keys[start:] + self.keys[:start]
+                key = next(k for k in ordered if k in healthy)
+
+            self._in_flight[key] += 1
+            self._sent[key] += 1
+            return key
+
+    def release(self, key: str):
+        with self._lock:
+            self._in_flight[key] -= 1
+
+    def has_available(self, host: str, exclude: Optional[str] = None) -> bool:
+        """
+        Whether a healthy key (other than `exclude`) is left for `host`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            return any(key != exclude and self._is_available(host, key, now) for key in self.keys)
+
+    def mark_unavailable(self, host: str, key: str, seconds: float, reason: str):
+        with self._lock:
+            until = time.monotonic() + seconds
+            if self._unavailable_until.get((host, key), 0.0) >= until:
+                return
+            self._unavailable_until[(host, key)] = until
+
+        if seconds >= 60:
+            print(f"🔑 {self.name} key …{key[-4:]} {reason} on {host}, left out for {seconds / 60:.0f} min", flush=True)
+
+
+# State (per-process)
+_pools: Dict[str, KeyPool] = {}
+_pools_by_key: Dict[str, KeyPool] = {}
+
+
+def _load_pools():
+    for name in KEY_POOL_ENV_VARS:
+        keys = [key.strip() for key in (os.getenv(name) or "").split(",") if key.strip()]
+        if not keys:
+            continue
+        pool = KeyPool(name, keys)
+        _pools[name] = pool
+        for key in keys:
+            # A key listed under several providers stays with the first pool
+            _pools_by_key.setdefault(key, pool)
+
+
+_load_pools()
+
+
+def get_env_key(name: str) -> Optional[str]:
+    """
+    The key to put in a provider call's header for env var `name` (its pool's
+    first key); core.http_client.request swaps in the pool's pick.
+    """
+    pool = _pools.get(name)
+    return pool.keys[0] if pool else None
+
+
+def get_key_pool(api_key: Optional[str]) -> Optional[KeyPool]:
+    """
+    The pool `api_key` belongs to, if it has other keys to rotate through.
+    """
+    pool = _pools_by_key.get(api_key) if api_key else None
+    if pool is None or len(pool.keys) < 2:
+        return None
+    return pool
+
+
+def get_key_id(api_key: Optional[str]) -> Optional[str]:
+    """
+    Short fingerprint of a key, safe to store in the DB in its place.
+    """
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16] if api_key else None
+
+
+def get_key_by_id(key_id: Optional[str]) -> Optional[str]:
+    """
+    The configured key with this fingerprint, if it is still in a pool.
+    """
+    if not key_id:
+        return None
+    return next((key for key in _pools_by_key if get_key_id(key) == key_id), None)
+
+
+def with_api_key(headers: dict, api_key: str) -> dict:
+    """
+    Copy of `headers` with the API key header (RapidAPI or Serper style) set to `api_key`.
+    """
+    return {
+        name: (api_key if name.lower() in ("x-rapidapi-key", "x-api-key") else value)
+        for name, value in headers.items()
+    }
@@ -0,0 +1,29 @@
+import threading
+from collections import Counter, defaultdict
+from typing import Dict
+
+
+# State (per-process)
+# Counters of the entries running in this process, saved to entry_metrics when a run ends
+_entry_counters: Dict[str, Counter] = defaultdict(Counter)
+_lock = threading.Lock()
+
+
+def increment(entry_id: str, name: str, amount: int = 1):
+    if not amount:
+        return
+    with _lock:
+        _entry_counters[entry_id][name] += amount
+
+
+def get_entry_counters(entry_id: str) -> dict:
+    """
+    Counters of the entry's current run (not saved yet).
+    """
+    with _lock:
+        return dict(_entry_counters.get(entry_id, {}))
+
+
+def pop_entry_counters(entry_id: str) -> dict:
+    with _lock:
+        return dict(_entry_counters.pop(entry_id, {}))
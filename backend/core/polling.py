@@ -0,0 +1,100 @@
+import os
+import random
+import threading
+from collections import deque
+from typing import Deque, Iterator, Optional
+
+from dotenv import load_dotenv
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+POLL_FIRST_DELAY = float(os.getenv("POLL_FIRST_DELAY", "2"))
+POLL_FACTOR = float(os.getenv("POLL_FACTOR", "1.5"))
+POLL_MAX_DELAY = float(os.getenv("POLL_MAX_DELAY", "20"))
+POLL_JITTER = float(os.getenv("POLL_JITTER", "0.2"))
+# Total time a search may take before it is reported as timed out (was 25 x 20 s)
+POLL_TIMEOUT = float(os.getenv("POLL_TIMEOUT", "500"))
+# How many past completion times are kept to tune the first delay
+POLL_HISTORY_SIZE = int(os.getenv("POLL_HISTORY_SIZE", "50"))
+# Completions needed before the history is trusted
+POLL_MIN_HISTORY = 5
+
+# State (per-process)
+_completion_times: Deque[float] = deque(maxlen=POLL_HISTORY_SIZE)
+_history_lock = threading.Lock()
+
+
+class PollPolicy:
+    """
+    Polling schedule: a short first delay, then capped exponential growth with jitter.
+    """
+
+    def __init__(
+        self,
+        first_delay: float = POLL_FIRST_DELAY,
+        factor: float = POLL_FACTOR,
+        max_delay: float = POLL_MAX_DELAY,
+        jitter: float = POLL_JITTER,
+        timeout: float = POLL_TIMEOUT,
+        max_attempts: Optional[int] = None,
+    ):
+        self.first_delay = first_delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+
+    @classmethod
+    def fixed(cls, delay: float, max_retries: int) -> "PollPolicy":
+        """
+        The old schedule: `max_retries` checks, `delay` seconds apart.
+        """
+        return cls(first_delay=delay, factor=1, max_delay=delay, jitter=0, timeout=delay * max_retries, max_attempts=max_retries)
+
+    def delays(self) -> Iterator[float]:
+        """
+        Yield the sleep before each next status check, until the timeout is spent.
+        """
+        elapsed = 0.0
+        attempts = 1
+        delay = self.first_delay
+        while elapsed < self.timeout:
+            if self.max_attempts is not None and attempts >= self.max_attempts:
+                return
+            sleep = min(delay, self.max_delay)
+            if self.jitter:
+                sleep *= random.uniform(1 - self.jitter, 1 + self.jitter)
+            sleep = min(sleep, self.timeout - elapsed)
+            yield sleep
+            elapsed += sleep
+            attempts += 1
+            delay *= self.factor
+
+
+def record_completion(seconds: float):
+    """
+    Remember how long a search took to complete.
+    """
+    with _history_lock:
+        _completion_times.append(seconds)
+
+
+def default_poll_policy() -> PollPolicy:
+    """
+    Policy tuned from past searches: the first check happens around the time
+    the fastest quarter of recent searches finished.
+    """
+    with _history_lock:
+        history = sorted(_completion_times)
+
+    if len(history) < POLL_MIN_HISTORY:
+        return PollPolicy()
+
+    p25 = history[len(history) // 4]
+    first_delay = min(max(p25, POLL_FIRST_DELAY), POLL_MAX_DELAY)
+
+    return PollPolicy(first_delay=first_delay)
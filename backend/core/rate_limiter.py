@@ -0,0 +1,172 @@
+import os
+import time
+import asyncio
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+# Requests per second allowed for each provider host and API key
+PROVIDER_RATE_LIMITS: Dict[str, float] = {
+    "web-scraping-api2.p.rapidapi.com": float(os.getenv("RATE_LIMIT_WEB_SCRAPING", "5")),
+    "email-finder7.p.rapidapi.com": float(os.getenv("RATE_LIMIT_EMAIL_FINDER", "5")),
+    "email-finder11.p.rapidapi.com": float(os.getenv("RATE_LIMIT_EMAIL_FINDER", "5")),
+    "validect-email-verification-v1.p.rapidapi.com": float(os.getenv("RATE_LIMIT_EMAIL_VERIFY", "5")),
+    "google.serper.dev": float(os.getenv("RATE_LIMIT_SERPER", "10")),
+}
+DEFAULT_RATE_LIMIT = float(os.getenv("RATE_LIMIT_DEFAULT", "5"))
+# Max requests sent back-to-back before the rate applies
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "5"))
+# How many times a throttled (429) call is queued and re-sent before giving up
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "5"))
+# Backoff used when a 429 carries no Retry-After header
+RATE_LIMIT_BACKOFF_SECONDS = float(os.getenv("RATE_LIMIT_BACKOFF_SECONDS", "2"))
+RATE_LIMIT_MAX_BACKOFF_SECONDS = float(os.getenv("RATE_LIMIT_MAX_BACKOFF_SECONDS", "60"))
+
+
+class TokenBucket:
+    """
+    Token bucket for one provider/API key.
+
+    Callers reserve a token and sleep until it is due, so they queue in
+    arrival order instead of failing. A 429 halves the rate and blocks the
+    bucket until the provider says we may retry; successful calls then
+    recover the rate step by step up to the configured limit.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """
+        Take a token (possibly borrowing from the future) and return how long to wait for it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+
+            wait = max(0.0, -self.tokens / self.rate)
+            return max(wait, self.blocked_until - now)
+
+    async def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+    def on_throttled(self, retry_after: Optional[float], attempt: int) -> float:
+        """
+        Slow down after a 429 and block the bucket; return the delay applied.
+        """
+        if retry_after is None:
+            retry_after = min(RATE_LIMIT_MAX_BACKOFF_SECONDS, RATE_LIMIT_BACKOFF_SECONDS * (2 ** attempt))
+
+        with self._lock:
+            self.rate = max(self.max_rate * 0.1, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+        return retry_after
+
+    def apply_headers(self, headers):
+        """
+        Block until the quota window resets when the provider reports none left.
+        Understands RapidAPI's X-RateLimit-Requests-* and the generic X-RateLimit-* headers.
+        """
+        remaining = _first_header(headers, "x-ratelimit-requests-remaining", "x-ratelimit-remaining")
+        reset = _first_header(headers, "x-ratelimit-requests-reset", "x-ratelimit-reset")
+
+        try:
+            remaining = int(remaining) if remaining is not None else None
+            reset = float(reset) if reset is not None else None
+        except ValueError:
+            return
+
+        if remaining is None or remaining > 0 or reset is None:
+            return
+
+        # Reset is either seconds until reset or an epoch timestamp
+        if reset > time.time():
+            reset -= time.time()
+
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + min(reset, RATE_LIMIT_MAX_BACKOFF_SECONDS))
+
+
+# State (per-process)
+_buckets: Dict[Tuple[str, str], TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def _first_header(headers, *names):
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+def get_rate_limiter(host: str, api_key: Optional[str]) -> TokenBucket:
+    """
+    Return the bucket shared by every call to `host` made with `api_key`.
+    """
+    key = (host, api_key or "")
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(PROVIDER_RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT), RATE_LIMIT_BURST)
+            _buckets[key] = bucket
+    return bucket
+
+
+def get_api_key(headers) -> Optional[str]:
+    """
+    API key a request is sent with (RapidAPI or Serper style header).
+    """
+    for name, value in (headers or {}).items():
+        if name.lower() in ("x-rapidapi-key", "x-api-key"):
+            return value
+    return None
+
+
+def get_retry_after(response) -> Optional[float]:
+    """
+    Seconds to wait according to the Retry-After header, if any.
+    """
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def is_quota_exhausted(response) -> bool:
+    """
+    RapidAPI also answers 429 when the plan's quota is used up; waiting won't help there.
+    """
+    return "quota" in response.text.lower()
@@ -0,0 +1,113 @@
+import os
+import heapq
+import asyncio
+import itertools
+import threading
+import weakref
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+# Weight of provider calls made outside any entry (e.g. from the dashboard)
+UNATTRIBUTED_CALL_WEIGHT = float(os.getenv("UNATTRIBUTED_CALL_WEIGHT", "1"))
+
+# Entry the current provider call is made for; set by the entry's run thread and
+# carried onto the provider loop by bind_entry()
+current_entry: ContextVar[Optional[str]] = ContextVar("current_entry", default=None)
+
+# State (per-process)
+_weights: Dict[str, float] = {}
+_weights_lock = threading.Lock()
+# Queues are bound to the loop they were created on, like the http clients
+_queues: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+
+def set_entry_priority(entry_id: str, priority):
+    """
+    Share of provider capacity the entry gets relative to the others (default 1).
+    """
+    with _weights_lock:
+        _weights[entry_id] = max(1.0, float(priority or 1))
+
+
+def get_entry_weight(entry_id: Optional[str]) -> float:
+    if entry_id is None:
+        return UNATTRIBUTED_CALL_WEIGHT
+    with _weights_lock:
+        return _weights.get(entry_id, 1.0)
+
+
+async def bind_entry(entry_id: Optional[str], coro):
+    """
+    Await `coro` with current_entry set, for coroutines scheduled on the provider
+    loop from an entry's thread (tasks there don't inherit the thread's context).
+    """
+    current_entry.set(entry_id)
+    return await coro
+
+
+class FairQueue:
+    """
+    Hands out one provider bucket's capacity across entries by weighted fair queuing.
+
+    Each waiting call gets a virtual finish time: the later of the queue's
+    virtual time and its entry's last finish, plus 1 / the entry's weight.
+    One dispatcher admits calls in finish-time order at the bucket's pace, so
+    an entry with thousands of calls queued can't delay a small entry's calls
+    by more than its share; with equal priorities, active entries alternate.
+    """
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.virtual_time = 0.0
+        self._finish: Dict[Optional[str], float] = {}
+        self._heap: List[Tuple[float, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def acquire(self, entry_id: Optional[str] = None):
+        loop = asyncio.get_running_loop()
+
+        start = max(self.virtual_time, self._finish.get(entry_id, 0.0))
+        finish = start + 1.0 / get_entry_weight(entry_id)
+        self._finish[entry_id] = finish
+
+        future = loop.create_future()
+        heapq.heappush(self._heap, (finish, next(self._seq), future))
+
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+
+        await future
+
+    async def _dispatch(self):
+        while self._heap:
+            finish, _, future = heapq.heappop(self._heap)
+            if future.done():
+                continue  # caller went away (cancelled)
+
+            await self.limiter.acquire()
+            self.virtual_time = finish
+            if not future.done():
+                future.set_result(None)
+
+        # Entries with nothing queued are as if new; forget them
+        self._finish = {entry_id: finish for entry_id, finish in self._finish.items() if finish > self.virtual_time}
+
+
+def get_fair_queue(limiter) -> FairQueue:
+    """
+    The queue in front of `limiter` (a core.rate_limiter.TokenBucket) on the running loop.
+    """
+    loop_queues = _queues.setdefault(asyncio.get_running_loop(), {})
+    queue = loop_queues.get(limiter)
+    if queue is None:
+        queue = FairQueue(limiter)
+        loop_queues[limiter] = queue
+    return queue
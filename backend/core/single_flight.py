@@ -0,0 +1,95 @@
+import os
+import json
+import asyncio
+import weakref
+from typing import Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from core import metrics
+from core.key_pool import get_key_id, get_key_pool
+from core.rate_limiter import get_api_key
+from core.scheduler import current_entry
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+# Identical provider calls in flight at the same time share one request
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+# State (per-process)
+# Flights are tasks of the loop they were started on, like the http clients
+_flights: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+def flight_key(method: str, url: str, kwargs: dict, rotate_key: bool = True) -> Optional[tuple]:
+    """
+    What makes two calls identical: endpoint, query params and JSON body, in
+    any key order, and the account they are sent for: the key's pool when the
+    call may be sent with any key of it, the key itself otherwise (calls with
+    different accounts may get different answers). None when the body can't
+    be compared (form data, files).
+    """
+    if kwargs.get("data") or kwargs.get("content") or kwargs.get("files"):
+        return None
+
+    params = tuple(sorted(
+        (str(name), str(value).strip()) for name, value in (kwargs.get("params") or {}).items() if value is not None
+    ))
+    body = kwargs.get("json")
+    api_key = get_api_key(kwargs.get("headers"))
+    pool = get_key_pool(api_key) if rotate_key else None
+    return (
+        method.upper(),
+        url.rstrip("/"),
+        params,
+        json.dumps(body, sort_keys=True, default=str) if body is not None else None,
+        f"pool:{pool.name}" if pool else get_key_id(api_key),
+    )
+
+
+async def share(key: tuple, send: Callable[[], Awaitable]):
+    """
+    Await `send()`, or the identical call already in flight under `key`.
+
+    The call runs as a task of its own, so a caller that is cancelled (entry
+    stopped, stage closed) doesn't cancel it for the others; it is cancelled
+    only once nobody waits for it. Each caller that joins a flight is counted
+    as the entry's "coalesced_calls".
+    """
+    loop = asyncio.get_running_loop()
+    loop_flights: Dict[tuple, _Flight] = _flights.setdefault(loop, {})
+
+    flight = loop_flights.get(key)
+    if flight is None:
+        flight = _Flight(loop.create_task(send()))
+        loop_flights[key] = flight
+
+        def landed(_):
+            if loop_flights.get(key) is flight:
+                del loop_flights[key]
+
+        flight.task.add_done_callback(landed)
+    else:
+        entry_id = current_entry.get()
+        if entry_id is not None:
+            metrics.increment(entry_id, "coalesced_calls")
+
+    flight.waiters += 1
+    try:
+        return await asyncio.shield(flight.task)
+    finally:
+        flight.waiters -= 1
+        if not flight.waiters and not flight.task.done():
+            # Forget it first: a call coming in before the task ends must not join a cancelled flight
+            if loop_flights.get(key) is flight:
+                del loop_flights[key]
+            flight.task.cancel()
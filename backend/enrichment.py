@@ -0,0 +1,364 @@
+import os
+import string
+import asyncio
+import concurrent.futures
+from collections import deque
+from functools import partial
+from typing import Any, Awaitable, Callable, Iterable, Iterator, Optional, Tuple
+
+from dotenv import load_dotenv
+
+import api_calls_async
+from core.http_client import submit
+from core.circuit_breaker import park_while_open
+from core.cancellation import CancellationToken
+from fixed_data.email_patterns import ALL_EMAIL_PATTERNS, DEFAULT_EMAIL_PATTERNS
+from utils.utils import generate_email_candidates, get_canonical_domain
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+# Max domains whose provider calls are in flight at once
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "8"))
+# "input" keeps the sheet order, "completion" hands each domain on as soon as it is ready
+ENRICH_ORDER = os.getenv("ENRICH_ORDER", "input")
+# Max leads of one company whose email is being found / verified at once
+LEAD_CONCURRENCY = int(os.getenv("LEAD_CONCURRENCY", "5"))
+# Email patterns guessed when find_email finds nothing: "default" (3 patterns), "all" (34 patterns)
+# or a comma separated list of templates, e.g. "{fn}.{ln},{fi}{ln},{fn}"
+EMAIL_GUESS_PATTERNS = os.getenv("EMAIL_GUESS_PATTERNS", "default")
+
+
+# Placeholders a local-part template may use (see fixed_data/email_patterns.py)
+EMAIL_PATTERN_FIELDS = {"fn", "ln", "fi", "li"}
+
+
+def _is_valid_email_pattern(pattern: str) -> bool:
+    try:
+        fields = [field for _, field, _, _ in string.Formatter().parse(pattern) if field is not None]
+    except ValueError:
+        return False
+    return bool(fields) and all(field in EMAIL_PATTERN_FIELDS for field in fields)
+
+
+def _load_email_guess_patterns():
+    """
+    The templates EMAIL_GUESS_PATTERNS names; custom ones with unknown
+    placeholders or bad braces are left out with a warning.
+    """
+    if EMAIL_GUESS_PATTERNS == "default":
+        return DEFAULT_EMAIL_PATTERNS
+    if EMAIL_GUESS_PATTERNS == "all":
+        return ALL_EMAIL_PATTERNS
+
+    patterns = []
+    for pattern in (pattern.strip() for pattern in EMAIL_GUESS_PATTERNS.split(",")):
+        if not pattern:
+            continue
+        if not _is_valid_email_pattern(pattern):
+            print(f"⚠️ EMAIL_GUESS_PATTERNS: skipping '{pattern}', placeholders must be {{fn}}, {{ln}}, {{fi}} or {{li}}", flush=True)
+            continue
+        patterns.append(pattern)
+
+    if not patterns:
+        print("⚠️ EMAIL_GUESS_PATTERNS has no usable template, guessing with the default patterns", flush=True)
+        return DEFAULT_EMAIL_PATTERNS
+    return patterns
+
+
+_email_guess_patterns = _load_email_guess_patterns()
+
+
+def get_email_guess_patterns():
+    return _email_guess_patterns
+
+
+async def fetch_company_and_revenue(rapidapi_key, lookup_domains, revenue_domain=None):
+    """
+    Company lookup and revenue lookup for one domain, sent in parallel.
+    `lookup_domains` are tried in order until one is found (domain, then its
+    simplified form); `revenue_domain` is None when the revenue is cached.
+    Each lookup waits out its own endpoint's open breaker, so one provider
+    being down doesn't fail or repeat the other lookup.
+    Returns ({lookup domain: company data}, revenue_data); revenue_data is
+    None when the revenue lookup failed or wasn't sent.
+    """
+    async def company():
+        company_lookups = {}
+        for domain in lookup_domains:
+            if company_lookups:
+                print(f"No results, retrying with simplified domain: {domain}")
+            company_lookups[domain] = await park_while_open(
+                partial(api_calls_async.get_company_by_domain, rapidapi_key, domain)
+            )
+            if company_lookups[domain]:
+                break
+        return company_lookups
+
+    async def revenue():
+        if not revenue_domain:
+            return None
+        return await park_while_open(partial(api_calls_async.get_revenue, revenue_domain))
+
+    return tuple(await asyncio.gather(company(), revenue()))
+
+
+async def find_lead_email(person_data, verify_key, catch_all_domains=frozenset()):
+    """
+    find_email for a lead, then with the simplified domain, then with guessed patterns.
+    Guessing is skipped on a known catch-all domain, where no guess can be told apart.
+    Returns (find_email response, verify response, verify calls saved); the verify
+    response is only set for a guessed address, which was verified to be picked.
+    The find_email response is None when the finder failed (no answer either way).
+    """
+    person_data = dict(person_data)
+    find_email_response = await api_calls_async.find_email(person_data)
+
+    # Step 1: Retry with simplified domain
+    if not isinstance(find_email_response, dict) or not find_email_response or find_email_response.get("address") == "email not found":
+        print(f"!!!!!!!!!!!!!!!!!! ALTERNATIVE 111111111111")
+        person_data["domain"] = ".".join(person_data["domain"].split(".")[-2:])
+        find_email_response = await api_calls_async.find_email(person_data)
+
+    verify_calls_saved = 0
+
+    # Step 2: Try guessed patterns
+    if not isinstance(find_email_response, dict) or not find_email_response or find_email_response.get("address") == "email not found":
+        if get_canonical_domain(person_data["domain"]) in catch_all_domains:
+            print(f"Catch-all domain '{person_data['domain']}', not guessing patterns")
+            verify_calls_saved = len(generate_email_candidates(
+                person_data["first_name"], person_data["last_name"], person_data["domain"], get_email_guess_patterns()
+            ))
+        else:
+            print(f"!!!!!!!!!!!!!!!!!! ALTERNATIVE 2222222222222")
+            guessed = await guess_email(person_data, verify_key)
+            if guessed:
+                email_guess, verify_email_response = guessed
+                return {"address": email_guess}, verify_email_response, verify_calls_saved
+
+    return (find_email_response if isinstance(find_email_response, dict) else None), None, verify_calls_saved
+
+
+async def guess_email(person_data, verify_key, patterns=None):
+    """
+    Verify all guessed addresses at once and keep the first one reported valid;
+    the checks still running are cancelled.
+    Returns (email, verify response), or None when no guess is valid.
+    """
+    candidates = generate_email_candidates(
+        person_data.get("first_name", ""),
+        person_data.get("last_name", ""),
+        person_data.get("domain", ""),
+        patterns or get_email_guess_patterns(),
+    )
+
+    tasks = {asyncio.ensure_future(api_calls_async.verify_email(verify_key, email)): email for email in candidates}
+    pending = set(tasks)
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                verify_email_response = task.result() or {}
+                if verify_email_response.get("status") == "valid":
+                    return tasks[task], verify_email_response
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def check_lead_email(person, verify_key, sup_emails=None, email_pattern=None, catch_all_domains=frozenset(), cached_person=None):
+    """
+    Find and verify one lead's email, and look up the lead's last activity
+    when the email is deliverable.
+
+    With `email_pattern` ((pattern, mail_domain) learned for the company),
+    only the address it generates is verified; find_email is used when that
+    address is not valid.
+
+    Addresses on `catch_all_domains` (known accept_all) are not verified again.
+
+    `cached_person` (from stores.person_store.get_cached_person) replaces
+    whichever of the three calls it has a fresh answer for.
+
+    Returns {"email", "email_status", "verify_status", "pattern_valid",
+    "verify_calls_saved", "profile_activity", "fetched"}.
+    pattern_valid is None when no pattern was tried or its address got no
+    definite valid / invalid answer, profile_activity is
+    None when it was not looked up, and fetched tells which of email /
+    verify / activity came from the providers rather than the cache.
+    """
+    person_data = {
+        "first_name": person["first_name"],
+        "last_name": person["last_name"],
+        "domain": person["domain"],
+    }
+
+    find_email_response = None
+    verify_email_response = None
+    pattern_valid = None
+    verify_calls_saved = 0
+    fetched = {"email": False, "verify": False, "activity": False}
+    cached_person = cached_person or {}
+
+    if "email" in cached_person:
+        print(f"✅ Email of {person['first_name']} {person['last_name']} from the person store")
+        find_email_response = {"address": cached_person["email"] or "email not found"}
+        if "email_status" in cached_person:
+            verify_email_response = {"status": cached_person["email_status"]}
+
+    if email_pattern and find_email_response is None:
+        pattern, mail_domain = email_pattern
+        candidates = generate_email_candidates(person["first_name"], person["last_name"], mail_domain, [pattern])
+        if candidates and get_canonical_domain(mail_domain) in catch_all_domains:
+            # Would only come back accept_all; find_email tells more
+            verify_calls_saved += 1
+        elif candidates:
+            pattern_response = await api_calls_async.verify_email(verify_key, candidates[0]) or {}
+            pattern_status = pattern_response.get("status")
+            # Only a definite answer says anything about the pattern; a failed check
+            # (no status), accept_all or unknown is neither a hit nor a miss
+            if pattern_status in ("valid", "invalid"):
+                pattern_valid = pattern_status == "valid"
+            if pattern_valid:
+                print(f"✅ Email from the company's pattern: {candidates[0]}")
+                find_email_response, verify_email_response = {"address": candidates[0]}, pattern_response
+
+    if find_email_response is None:
+        find_email_response, verify_email_response, guesses_saved = await find_lead_email(person_data, verify_key, catch_all_domains)
+        verify_calls_saved += guesses_saved
+
+    # A failed finder call (timeout, 429, 5xx) is no answer; only a real one is cached
+    if "email" not in cached_person:
+        fetched["email"] = find_email_response is not None
+        fetched["verify"] = verify_email_response is not None
+
+    if find_email_response:
+        email = find_email_response.get("address", "email not found")
+    else:
+        email = "email not found"
+
+    print(f"✅ Done Step 8 (Find lead email: find-one/)")
+
+    if email == "email not found":
+        return {
+            "email": "-",
+            "email_status": "email not found",
+            "verify_status": None,
+            "pattern_valid": pattern_valid,
+            "verify_calls_saved": verify_calls_saved,
+            "profile_activity": None,
+            "fetched": fetched,
+        }
+
+    if verify_email_response is None and get_canonical_domain(email.partition("@")[2]) in catch_all_domains:
+        print(f"Catch-all domain, not verifying {email}")
+        verify_email_response = {"status": "accept_all"}
+        verify_calls_saved += 1
+
+    if verify_email_response is None:
+        verify_email_response = await api_calls_async.verify_email(verify_key, email)
+        fetched["verify"] = True
+    email_status = verify_email_response.get("status", "")
+    verify_status = email_status
+
+    print(f"~~~~~~~~~ {email} ----- {email_status}")
+    print(f"✅ Done Step 9 (Verify lead email: find-one/)")
+
+    # Check email in sup list
+    if email_status in ("valid", "accept_all") and sup_emails:
+        print(f"✅ Done Step 10 (Check email in sup list)")
+        if email in sup_emails:
+            email_status = "sup"
+
+    profile_activity = None
+    if email_status in ("valid", "accept_all") and person["linkedin_url"] and person["linkedin_url"] != "-":
+        if "last_activity" in cached_person:
+            profile_activity = {"recent_activity_time": cached_person["last_activity"]}
+        else:
+            profile_activity = await api_calls_async.get_profile_activity(person["linkedin_url"])
+            fetched["activity"] = True
+
+    return {
+        "email": email,
+        "email_status": email_status,
+        "verify_status": verify_status,
+        "pattern_valid": pattern_valid,
+        "verify_calls_saved": verify_calls_saved,
+        "profile_activity": profile_activity,
+        "fetched": fetched,
+    }
+
+
+class EnrichmentStage:
+    """
+    Runs the provider calls of many domains (or leads) at once on the provider loop.
+
+    Takes (item, coroutine factory) pairs and yields (item, result) pairs,
+    with at most `concurrency` coroutines in flight. Input is pulled lazily, so
+    a caller that stops iterating (entry stopped, goal met) stops new calls
+    from being sent; close() cancels the ones still in flight. An item whose
+    factory is None needs no calls and is passed through with result None.
+    Waits give up with Cancelled as soon as `token` is cancelled. Calls that hit
+    an open circuit breaker are parked until its probe gets through
+    (core.circuit_breaker.park_while_open) rather than failing the item.
+    """
+
+    def __init__(self, concurrency: int = ENRICH_CONCURRENCY, order: str = ENRICH_ORDER, token: Optional[CancellationToken] = None):
+        if order not in ("input", "completion"):
+            raise ValueError(f"Unknown enrichment order: {order}")
+        self.concurrency = max(1, concurrency)
+        self.order = order
+        self.token = token or CancellationToken()
+        self._in_flight: deque = deque()
+
+    def _start(self, item, factory: Optional[Callable[[], Awaitable]]) -> Tuple[Any, concurrent.futures.Future]:
+        if factory is None:
+            future = concurrent.futures.Future()
+            future.set_result(None)
+        else:
+            future = submit(park_while_open(factory))
+        return item, future
+
+    def _take_done(self) -> Tuple[Any, concurrent.futures.Future]:
+        if self.order == "input":
+            self.token.wait(self._in_flight[0][1])
+            return self._in_flight.popleft()
+
+        self.token.wait_any(future for _, future in self._in_flight)
+        for pair in self._in_flight:
+            if pair[1].done():
+                self._in_flight.remove(pair)
+                return pair
+
+    def run(self, jobs: Iterable[Tuple[Any, Optional[Callable[[], Awaitable]]]]) -> Iterator[Tuple[Any, Any]]:
+        jobs = iter(jobs)
+        exhausted = False
+
+        try:
+            while True:
+                while not exhausted and len(self._in_flight) < self.concurrency:
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                    else:
+                        self._in_flight.append(self._start(*job))
+
+                if not self._in_flight:
+                    return
+
+                item, future = self._take_done()
+                yield item, future.result()
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Cancel the calls still in flight.
+        """
+        while self._in_flight:
+            _, future = self._in_flight.popleft()
+            future.cancel()
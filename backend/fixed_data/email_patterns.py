@@ -0,0 +1,47 @@
+# Local-part templates for guessing a lead's email
+# fn / ln = first / last name, fi / li = their initials
+
+DEFAULT_EMAIL_PATTERNS = [
+    "{fn}.{ln}",
+    "{fi}.{ln}",
+    "{fi}{ln}",
+]
+
+
+# Same set as the old generate_emails_alternative (advanced version) in api_calls.py
+ALL_EMAIL_PATTERNS = [
+    "{fn}",
+    "{ln}",
+    "{fn}{ln}",
+    "{fn}.{ln}",
+    "{fi}{ln}",
+    "{fi}.{ln}",
+    "{fn}{li}",
+    "{fn}.{li}",
+    "{fi}{li}",
+    "{fi}.{li}",
+    "{ln}{fn}",
+    "{ln}.{fn}",
+    "{ln}{fi}",
+    "{ln}.{fi}",
+    "{li}{fn}",
+    "{li}.{fn}",
+    "{li}{fi}",
+    "{li}.{fi}",
+    "{fn}-{ln}",
+    "{fi}-{ln}",
+    "{fn}-{li}",
+    "{fi}-{li}",
+    "{ln}-{fn}",
+    "{ln}-{fi}",
+    "{li}-{fn}",
+    "{li}-{fi}",
+    "{fn}_{ln}",
+    "{fi}_{ln}",
+    "{fn}_{li}",
+    "{fi}_{li}",
+    "{ln}_{fn}",
+    "{ln}_{fi}",
+    "{li}_{fn}",
+    "{li}_{fi}",
+]
@@ -0,0 +1,266 @@
+import os
+import time
+import argparse
+import threading
+import multiprocessing
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import update
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import init_db, SessionLocal, ProcessEntry
+from process.run_process import process_entry_logic
+from stores.item_store import ITEM_LEASE_SECONDS, has_claimable_items, has_leased_items
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+# Entries processed at once by one runner (one worker thread each); the rest wait as "Queued"
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# How often idle workers look for queued entries (entries queued in this process wake them at once)
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+# Run a runner inside the web app; set to false when workers run with `python job_runner.py`
+JOB_RUNNER_IN_APP = os.getenv("JOB_RUNNER_IN_APP", "true").lower() == "true"
+# Idle workers help with running entries that still have items free to lease (or left by a dead worker)
+JOB_JOIN_RUNNING = os.getenv("JOB_JOIN_RUNNING", "true").lower() == "true"
+
+
+def enqueue_entry(db, entry: ProcessEntry):
+    """
+    Put an entry in the queue; a free worker (of any runner) picks it up.
+    """
+    entry.status = "Queued"
+    entry.is_stopped = False
+    entry.error_message = ""
+    entry.updated_at = datetime.utcnow()
+    db.commit()
+
+    if _runner is not None:
+        _runner.wake()
+
+
+def claim_next_entry() -> Optional[str]:
+    """
+    Take the queued entry with the highest priority (oldest first) and mark it
+    "In Progress"; None when the queue is empty.
+    The conditional update makes the claim safe across runners and processes.
+    """
+    db = SessionLocal()
+    try:
+        # A few candidates, in case other runners claim the first ones meanwhile
+        queued = db.query(ProcessEntry.id)\
+            .filter(ProcessEntry.status == "Queued")\
+            .order_by(ProcessEntry.priority.desc(), ProcessEntry.updated_at)\
+            .limit(10)\
+            .all()
+
+        for (entry_id,) in queued:
+            result = db.execute(
+                update(ProcessEntry)
+                .where(ProcessEntry.id == entry_id, ProcessEntry.status == "Queued")
+                .values(status="In Progress")
+            )
+            db.commit()
+            if result.rowcount == 1:
+                return entry_id
+
+        return None
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"⚠️ Could not read the job queue: {e}", flush=True)
+        return None
+    finally:
+        db.close()
+
+
+def find_entry_to_join() -> Optional[str]:
+    """
+    A running entry with items no worker holds, highest priority first; None if there is none.
+    """
+    db = SessionLocal()
+    try:
+        running = db.query(ProcessEntry.id)\
+            .filter(ProcessEntry.status == "In Progress", ProcessEntry.is_stopped.isnot(True))\
+            .order_by(ProcessEntry.priority.desc(), ProcessEntry.updated_at)\
+            .all()
+
+        for (entry_id,) in running:
+            if has_claimable_items(db, entry_id):
+                return entry_id
+
+        return None
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"⚠️ Could not read running entries: {e}", flush=True)
+        return None
+    finally:
+        db.close()
+
+
+def requeue_orphaned_entries() -> int:
+    """
+    Put back in the queue "In Progress" entries no worker is running: none of
+    their items is leased and they haven't changed for ITEM_LEASE_SECONDS
+    (left by a crash or restart). Returns how many were queued.
+    """
+    db = SessionLocal()
+    try:
+        stale_before = datetime.utcnow() - timedelta(seconds=ITEM_LEASE_SECONDS)
+        running = db.query(ProcessEntry.id)\
+            .filter(ProcessEntry.status == "In Progress", ProcessEntry.updated_at < stale_before)\
+            .all()
+
+        requeued = 0
+        for (entry_id,) in running:
+            if has_leased_items(db, entry_id):
+                continue
+
+            result = db.execute(
+                update(ProcessEntry)
+                .where(ProcessEntry.id == entry_id, ProcessEntry.status == "In Progress")
+                .values(status="Queued", updated_at=datetime.utcnow())
+            )
+            db.commit()
+            requeued += result.rowcount
+
+        if requeued:
+            print(f"🔁 {requeued} entries left in progress by a stopped worker queued again", flush=True)
+        return requeued
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"⚠️ Could not requeue orphaned entries: {e}", flush=True)
+        return 0
+    finally:
+        db.close()
+
+
+class JobRunner:
+    """
+    Processes queued entries on `workers` threads, one entry per thread.
+
+    Replaces running whole entries in the web server's BackgroundTasks: at most
+    `workers` entries run per runner, and entries beyond that stay "Queued"
+    until a worker is free. Several runners (the web app, `python job_runner.py`
+    on other processes or machines) can share the queue.
+
+    With an empty queue, idle workers join running entries (JOB_JOIN_RUNNING)
+    and lease their free items, which is also how items of a dead worker are
+    picked up again once their leases expire. Entries left "In Progress" by a
+    crash are queued again when a runner starts.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, poll_seconds: float = JOB_POLL_SECONDS):
+        self.workers = max(1, workers)
+        self.poll_seconds = poll_seconds
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        requeue_orphaned_entries()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"🚀 Job runner started with {self.workers} workers", flush=True)
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self):
+        """
+        Stop taking entries; the ones running are left to finish.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self):
+        while not self._stopping.is_set():
+            entry_id = claim_next_entry()
+            join = False
+            if entry_id is None and JOB_JOIN_RUNNING:
+                entry_id = find_entry_to_join()
+                join = entry_id is not None
+
+            if entry_id is None:
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+                continue
+
+            print(f"▶️ {threading.current_thread().name} {'joining' if join else 'processing'} entry {entry_id}", flush=True)
+            try:
+                process_entry_logic(entry_id, join=join)
+            except Exception as e:
+                print(f"❌ Entry {entry_id} crashed the worker: {e}", flush=True)
+
+
+# State (per-process)
+_runner: Optional[JobRunner] = None
+
+
+def start_job_runner(workers: int = JOB_WORKERS) -> JobRunner:
+    """
+    Start this process's runner (once).
+    """
+    global _runner
+    if _runner is None:
+        _runner = JobRunner(workers)
+        _runner.start()
+    return _runner
+
+
+def stop_job_runner():
+    if _runner is not None:
+        _runner.stop()
+
+
+def run_workers(workers: int = JOB_WORKERS):
+    """
+    Run a runner in the foreground until interrupted.
+    """
+    runner = start_job_runner(workers)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("⏹️ Job runner stopping, waiting for the running entries", flush=True)
+        runner.stop()
+        runner.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued entries outside the web server.")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS, help="entries processed at once per process")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to start")
+    args = parser.parse_args()
+
+    init_db()
+
+    if args.processes <= 1:
+        run_workers(args.workers)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_workers, args=(args.workers,), name=f"job-runner-{index}")
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
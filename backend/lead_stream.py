@@ -0,0 +1,153 @@
+import os
+import json
+import tempfile
+import concurrent.futures
+from collections import defaultdict
+from functools import partial
+from typing import Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+import api_calls_async
+from core.http_client import submit
+from core.circuit_breaker import park_while_open
+from core.cancellation import CancellationToken
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+# Hard stop in case the API keeps returning pages
+SEARCH_RESULTS_MAX_PAGES = int(os.getenv("SEARCH_RESULTS_MAX_PAGES", "50"))
+# Leads of one batch kept in memory; any beyond are spilled to a temp JSONL file
+LEADS_SPILL_THRESHOLD = int(os.getenv("LEADS_SPILL_THRESHOLD", "1000"))
+
+
+class SearchResultsStream:
+    """
+    Lazily pages through get_search_results for one request_id.
+
+    Pages are fetched only when a company's buffered leads run out, and the
+    page after the one just read is prefetched in the background while those
+    leads are processed. Stop consuming (and call close()) once lpc / goal is
+    met and no further pages are paid for. Waiting for a page raises
+    Cancelled once `token` is cancelled.
+    """
+
+    def __init__(self, rapidapi_key, request_id, total_count: Optional[int] = None, max_pages: int = SEARCH_RESULTS_MAX_PAGES, token: Optional[CancellationToken] = None):
+        self.rapidapi_key = rapidapi_key
+        self.token = token or CancellationToken()
+        self.request_id = request_id
+        self.total_count = total_count
+        self.max_pages = max_pages
+        self.fetched_count = 0
+        self.pages_fetched = 0
+        self.exhausted = False
+        self._next_page = 1
+        self._prefetch: Optional[concurrent.futures.Future] = None
+        self._buffer: Dict[object, List[dict]] = defaultdict(list)
+
+    def _start_fetch(self, page: int) -> concurrent.futures.Future:
+        return submit(park_while_open(partial(api_calls_async.get_search_results, self.rapidapi_key, self.request_id, page)))
+
+    def _fetch_next_page(self) -> bool:
+        """
+        Read the next page into the buffer; False once there is nothing more to read.
+        """
+        if self.exhausted:
+            return False
+
+        future = self._prefetch or self._start_fetch(self._next_page)
+        self._prefetch = None
+        page_data = self.token.wait(future) or {}
+        leads = page_data.get("data") or []
+
+        self.pages_fetched += 1
+        self.fetched_count += len(leads)
+        self._next_page += 1
+
+        if self.total_count is None:
+            self.total_count = page_data.get("total_count")
+
+        if (
+            not leads
+            or self._next_page > self.max_pages
+            or (self.total_count is not None and self.fetched_count >= self.total_count)
+        ):
+            self.exhausted = True
+        else:
+            self._prefetch = self._start_fetch(self._next_page)
+
+        for lead in leads:
+            self._buffer[lead.get("company_id")].append(lead)
+
+        return bool(leads)
+
+    def batches_for(self, company_id) -> Iterator[List[dict]]:
+        """
+        Yield this company's leads in batches: whatever is buffered first, then
+        the company's share of each further page, fetched only when asked for.
+        """
+        while True:
+            if self._buffer.get(company_id):
+                yield self._buffer.pop(company_id)
+            elif not self._fetch_next_page():
+                return
+
+    def close(self):
+        """
+        Drop the background prefetch, if any.
+        """
+        if self._prefetch is not None:
+            self._prefetch.cancel()
+            self._prefetch = None
+
+
+class LeadBuffer:
+    """
+    Leads handed from the title / geo checks to the email step.
+
+    Held in memory up to `spill_threshold`; the rest is appended to a JSONL
+    file in the temp dir (one per entry and batch) and read back line by line
+    while iterating. close() removes the file.
+    """
+
+    def __init__(self, entry_id, spill_threshold: int = LEADS_SPILL_THRESHOLD):
+        self.entry_id = entry_id
+        self.spill_threshold = spill_threshold
+        self._leads: List[dict] = []
+        self._spill = None
+        self._spilled_count = 0
+
+    def __len__(self):
+        return len(self._leads) + self._spilled_count
+
+    def append(self, lead: dict):
+        if len(self._leads) < self.spill_threshold:
+            self._leads.append(lead)
+            return
+
+        if self._spill is None:
+            self._spill = tempfile.NamedTemporaryFile(
+                mode="w+", encoding="utf-8", prefix=f"leads_{self.entry_id}_", suffix=".jsonl"
+            )
+        self._spill.write(json.dumps(lead) + "\n")
+        self._spilled_count += 1
+
+    def __iter__(self) -> Iterator[dict]:
+        yield from list(self._leads)
+
+        if self._spill is not None:
+            self._spill.flush()
+            with open(self._spill.name, "r", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+
+    def close(self):
+        self._leads = []
+        self._spilled_count = 0
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
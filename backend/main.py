@@ -17,13 +17,19 @@ from fixed_data.functions import valid_functions
 from fixed_data.levels import all_job_levels
 from fixed_data.countries_id import country_ids
 from google_service.utils import *
-from datetime import datetime
+from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from models import init_db, SessionLocal, ProcessEntry
 import uuid
 from sqlalchemy import text, case, func, desc
-from process.run_process import process_entry_logic
+from job_runner import JOB_RUNNER_IN_APP, enqueue_entry, start_job_runner, stop_job_runner
 from cache_manager import get_processed_data, cleanup_old_cache_entries
+from stores.metrics_store import get_entry_metrics
+from stores.search_store import delete_expired_pending_searches
+from stores.item_store import ITEM_LEASE_SECONDS, has_leased_items
+from core.cancellation import cancel_entry
+from core.scheduler import set_entry_priority
+from core.circuit_breaker import get_breaker_states
 import asyncio
 
 
@@ -58,6 +64,34 @@ async def startup_cache_cleanup():
     asyncio.create_task(cleanup_old_cache_entries())
 
 
+@app.on_event("startup")
+def startup_job_runner():
+    """
+    Process queued entries in this process, unless workers run separately.
+    """
+    if JOB_RUNNER_IN_APP:
+        start_job_runner()
+
+
+@app.on_event("shutdown")
+def shutdown_job_runner():
+    stop_job_runner()
+
+
+@app.on_event("startup")
+def startup_pending_search_cleanup():
+    """
+    Drop recorded searches too old to be re-attached on resume.
+    """
+    db = SessionLocal()
+    try:
+        count = delete_expired_pending_searches(db)
+        if count:
+            print(f"🧹 Dropped {count} expired pending searches", flush=True)
+    finally:
+        db.close()
+
+
 # ✅ Migration-safe column adding
 # def add_column_if_not_exists(db: Session, table_name: str, column_name: str, column_type: str):
 #     try:
@@ -138,7 +172,7 @@ def dashboard(
     error = request.query_params.get("error")
 
     status_priority = case(
-        (func.lower(func.trim(ProcessEntry.status)) == "in progress", 1),
+        (func.lower(func.trim(ProcessEntry.status)).in_(["in progress", "queued"]), 1),
         else_=0
     )
 
@@ -173,7 +207,7 @@ def dashboard(
 
 
 @app.post("/process")
-async def process_sheet(request: Request, db: Session = Depends(get_db), background_tasks: BackgroundTasks = None,):
+async def process_sheet(request: Request, db: Session = Depends(get_db)):
     """
     Process the start action.
     """
@@ -195,8 +229,9 @@ async def process_sheet(request: Request, db: Session = Depends(get_db), backgro
     id=entry_id,
     name=sheet_name,
     url=sheet_url,
-    status="In Progress",
+    status="Queued",
     last_processed_row=1,
+    priority=max(1, int(data.get("priority") or 1)),
     input_data={
         "geo": data.get("geo"),
         "exclude_keywords": data.get("exclude_keywords"),
@@ -217,25 +252,14 @@ async def process_sheet(request: Request, db: Session = Depends(get_db), backgro
 
     db.add(entry)
     db.commit()
-    
-    # db.refresh(entry)
-
-    def run_main_logic(entry_id: str):
-        """
-        Run main process.
-        """
-        db = SessionLocal()  
-        try:
-            process_entry_logic(entry_id)
-        finally:
-            db.close()
 
-    background_tasks.add_task(run_main_logic, entry_id)
+    # A job worker picks it up as soon as one is free
+    enqueue_entry(db, entry)
 
     return JSONResponse(content={
         "success": True,
         "entry_id": entry_id,
-        "message": "Processing started"
+        "message": "Queued for processing"
     })
 
 
@@ -257,10 +281,61 @@ def api_entries(request: Request, access_token: str = Cookie(None), db: Session
         "url": entry.url,
         "status": entry.status,
         "error_message": entry.error_message,
+        "priority": entry.priority,
 
     } for entry in entries]))
 
 
+@app.get("/api/entries/{entry_id}/metrics")
+def api_entry_metrics(entry_id: str, access_token: str = Cookie(None), db: Session = Depends(get_db)):
+    """
+    Run counters of an entry (e.g. verify calls saved by the catch-all cache).
+    """
+    if not access_token or verify_token(access_token) is None:
+        return JSONResponse(status_code=401, content={"error": "Unauthorized"})
+
+    return JSONResponse(content={"entry_id": entry_id, "metrics": get_entry_metrics(db, entry_id)})
+
+
+@app.get("/api/providers/breakers")
+def api_provider_breakers(access_token: str = Cookie(None)):
+    """
+    Circuit breaker state of each provider endpoint called by this process.
+    """
+    if not access_token or verify_token(access_token) is None:
+        return JSONResponse(status_code=401, content={"error": "Unauthorized"})
+
+    return JSONResponse(content={"breakers": get_breaker_states()})
+
+
+@app.post("/api/entries/{entry_id}/priority")
+async def api_entry_priority(entry_id: str, request: Request, access_token: str = Cookie(None), db: Session = Depends(get_db)):
+    """
+    Set an entry's priority: its share of provider calls next to the other
+    running entries (1 = equal share), and its place in the queue.
+    """
+    if not access_token or verify_token(access_token) is None:
+        return JSONResponse(status_code=401, content={"error": "Unauthorized"})
+
+    data = await request.json()
+    try:
+        priority = max(1, int(data.get("priority")))
+    except (TypeError, ValueError):
+        return JSONResponse(status_code=400, content={"error": "priority must be a positive integer"})
+
+    entry = db.query(ProcessEntry).filter_by(id=entry_id).first()
+    if not entry:
+        return JSONResponse(status_code=404, content={"error": "Entry not found"})
+
+    entry.priority = priority
+    db.commit()
+
+    # Runs in this process use it right away; runs elsewhere when they next start
+    set_entry_priority(entry_id, priority)
+
+    return JSONResponse(content={"entry_id": entry_id, "priority": priority})
+
+
 @app.post("/stop/{entry_id}")
 def stop_entry(entry_id: str, user: dict = Depends(get_current_user)):
     db = SessionLocal()
@@ -270,6 +345,9 @@ def stop_entry(entry_id: str, user: dict = Depends(get_current_user)):
             entry.is_stopped = True
             entry.status = "Stopped"
             db.commit()
+
+            # Wake the run right away if it is in this process; others see the DB flag
+            cancel_entry(entry_id)
             return {"success": True, "status": entry.status}  
         return {"success": False, "error": "Entry not found"}
     finally:
@@ -277,7 +355,7 @@ def stop_entry(entry_id: str, user: dict = Depends(get_current_user)):
 
 
 @app.post("/resume/{entry_id}")
-def resume_process(entry_id: str, background_tasks: BackgroundTasks):
+def resume_process(entry_id: str):
     """
     Continue process if failed or stopped.
     """
@@ -287,17 +365,21 @@ def resume_process(entry_id: str, background_tasks: BackgroundTasks):
         if not entry:
             return {"error": "Entry not found"}
 
-        # Only resume if stopped or failed
-        if entry.status in ["Stopped", "Failed"]:
-            entry.is_stopped = False
-            entry.status = "In Progress"
-            db.commit()
-            db.refresh(entry)
-
-        # Schedule processing in background
-        background_tasks.add_task(process_entry_logic, entry_id)
-
-        return {"message": "Resuming process in background"}
+        # Already waiting for, or held by, a worker; "In Progress" with no live leases
+        # and no change for ITEM_LEASE_SECONDS is left over from a crash or restart and
+        # can be resumed (a run that just started may not hold its leases yet)
+        if entry.status == "In Progress":
+            stale_before = datetime.utcnow() - timedelta(seconds=ITEM_LEASE_SECONDS)
+            is_stale = entry.updated_at is None or entry.updated_at < stale_before
+            if not is_stale or has_leased_items(db, entry_id):
+                return {"message": "Entry is already in progress"}
+        elif entry.status == "Queued":
+            return {"message": "Entry is already queued"}
+
+        # Back in the queue; a job worker continues it as soon as one is free
+        enqueue_entry(db, entry)
+
+        return {"message": "Queued for resuming"}
 
     except Exception as e:
         db.rollback()
@@ -3,7 +3,7 @@ from sqlalchemy import create_engine, Column, String, Text, Boolean, Integer, Da
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 from datetime import datetime
 import os
-from sqlalchemy import JSON
+from sqlalchemy import JSON, Index, inspect, text
 
 
 # ---------- Database Setup ----------
@@ -70,6 +70,8 @@ class ProcessEntry(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     error_message = Column(Text, nullable=True) 
     input_data = Column(JSON, nullable=True)
+    suitable_count = Column(Integer, default=0, nullable=False)  # suitable leads of processed items, over all workers and runs
+    priority = Column(Integer, default=1, nullable=False)  # share of provider capacity and queue order, see core/scheduler.py
 
     items = relationship(
         "ProcessItem",
@@ -77,6 +79,16 @@ class ProcessEntry(Base):
         cascade="all, delete-orphan"
     )
 
+    metrics = relationship(
+        "EntryMetric",
+        cascade="all, delete-orphan"
+    )
+
+    pending_searches = relationship(
+        "PendingSearch",
+        cascade="all, delete-orphan"
+    )
+
 
 class ProcessItem(Base):
     __tablename__ = "process_items"
@@ -85,9 +97,138 @@ class ProcessItem(Base):
     value = Column(String)  
     status = Column(String, default="unprocessed")  
     result = Column(JSON)    
+    lease_owner = Column(String, nullable=True)  # worker processing the item, see stores/item_store.py
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
 
     entry = relationship("ProcessEntry", back_populates="items")
 
 
+class CompanyRecord(Base):
+    """
+    Company enrichment shared across entries, keyed by canonical domain.
+    """
+    __tablename__ = "company_records"
+
+    domain = Column(String, primary_key=True, index=True)
+    company_name = Column(String, nullable=True)
+    employee_range = Column(String, nullable=True)
+    employee_count = Column(Integer, nullable=True)
+    industries = Column(JSON, nullable=True)
+    company_id = Column(JSON, nullable=True)  # kept as returned by the API (int or str)
+    linkedin_url = Column(String, nullable=True)
+    company_fetched_at = Column(DateTime, nullable=True)
+    revenue = Column(String, nullable=True)
+    revenue_prooflink = Column(String, nullable=True)
+    revenue_fetched_at = Column(DateTime, nullable=True)
+
+
+class FailedDomainLookup(Base):
+    """
+    Domains the company API answered for but had no company, kept for a short TTL.
+    """
+    __tablename__ = "failed_domain_lookups"
+
+    domain = Column(String, primary_key=True, index=True)
+    failed_at = Column(DateTime, nullable=False)
+
+
+class EmailPattern(Base):
+    """
+    Email pattern a company uses, learned from verified addresses of its leads.
+    """
+    __tablename__ = "email_patterns"
+
+    domain = Column(String, primary_key=True, index=True)  # company domain the leads were searched for
+    pattern = Column(String, nullable=False)  # local-part template, see fixed_data/email_patterns.py
+    mail_domain = Column(String, nullable=False)  # domain the addresses are on (may differ from the company domain)
+    confirmed_count = Column(Integer, default=0, nullable=False)
+    failed_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class PersonRecord(Base):
+    """
+    Email, verification and activity found for a lead, shared across entries.
+    Found by linkedin_url, or by name and company domain when there is no url.
+    Each part has its own timestamp, so each can go stale on its own.
+    """
+    __tablename__ = "person_records"
+
+    id = Column(Integer, primary_key=True, index=True)
+    linkedin_url = Column(String, nullable=True, unique=True, index=True)  # canonical, see get_canonical_linkedin_url
+    first_name = Column(String, nullable=False)
+    last_name = Column(String, nullable=False)
+    domain = Column(String, nullable=False)
+    email = Column(String, nullable=True)  # None with email_found_at set: searched, not found
+    email_found_at = Column(DateTime, nullable=True)
+    email_status = Column(String, nullable=True)
+    verified_at = Column(DateTime, nullable=True)
+    last_activity = Column(String, nullable=True)
+    activity_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_person_records_name_domain", "first_name", "last_name", "domain"),
+    )
+
+
+class CatchAllDomain(Base):
+    """
+    Mail domains the verifier reported as catch-all (accept_all), kept for a TTL.
+    """
+    __tablename__ = "catch_all_domains"
+
+    domain = Column(String, primary_key=True, index=True)
+    checked_at = Column(DateTime, nullable=False)
+
+
+class EntryMetric(Base):
+    """
+    Counters of an entry's run (e.g. verify calls saved by caches), summed over resumes.
+    """
+    __tablename__ = "entry_metrics"
+
+    entry_id = Column(String, ForeignKey("process_entries.id"), primary_key=True)
+    name = Column(String, primary_key=True)
+    value = Column(Integer, default=0, nullable=False)
+
+
+class PendingSearch(Base):
+    """
+    A chunk's search_leads request that was submitted but not processed yet,
+    so a resumed run can wait for it instead of paying for a new search.
+    """
+    __tablename__ = "pending_searches"
+
+    request_id = Column(String, primary_key=True)
+    entry_id = Column(String, ForeignKey("process_entries.id"), nullable=False, index=True)
+    company_ids = Column(JSON, nullable=False)  # the chunk, in search order
+    filters = Column(JSON, nullable=False)  # keywords, job_functions, levels, geo_codes, geolocations, requirement_index
+    submitted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    api_key_id = Column(String, nullable=True)  # fingerprint of the pooled key it was submitted with (core.key_pool.get_key_id)
+
+
+# Columns added to tables that may already exist; create_all only creates missing tables
+ADDED_COLUMNS = [
+    ("process_entries", "suitable_count", "INTEGER DEFAULT 0 NOT NULL"),
+    ("process_entries", "priority", "INTEGER DEFAULT 1 NOT NULL"),
+    ("process_items", "lease_owner", "VARCHAR"),
+    ("process_items", "lease_expires_at", "TIMESTAMP"),
+    ("process_items", "heartbeat_at", "TIMESTAMP"),
+    ("pending_searches", "api_key_id", "VARCHAR"),
+]
+
+
+def add_missing_columns():
+    inspector = inspect(engine)
+    for table_name, column_name, column_type in ADDED_COLUMNS:
+        columns = [col["name"] for col in inspector.get_columns(table_name)]
+        if column_name not in columns:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+            print(f"✅ Added column '{column_name}' to '{table_name}'", flush=True)
+
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
@@ -0,0 +1,193 @@
+import os
+import math
+import time
+import asyncio
+import threading
+import concurrent.futures
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set
+
+from dotenv import load_dotenv
+
+import api_calls_async
+from core.http_client import get_provider_loop
+from core.scheduler import bind_entry, current_entry
+from core.circuit_breaker import CircuitOpen
+from core.polling import PollPolicy, default_poll_policy, record_completion
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+# Resolution of the timer wheel in seconds
+POLL_TICK_SECONDS = float(os.getenv("POLL_TICK_SECONDS", "1"))
+# Max status checks sent at once when many searches are due in the same tick
+POLL_BATCH_SIZE = int(os.getenv("POLL_BATCH_SIZE", "20"))
+# A status check not answered in this many seconds is given up and tried again at the next delay
+POLL_CHECK_TIMEOUT_SECONDS = float(os.getenv("POLL_CHECK_TIMEOUT_SECONDS", "30"))
+
+TIMEOUT_RESULT = {"status": "Search did not complete in time."}
+
+
+class _PendingSearch:
+    def __init__(self, rapidapi_key, request_id, policy: PollPolicy, future: asyncio.Future):
+        self.rapidapi_key = rapidapi_key
+        self.request_id = request_id
+        self.delays = policy.delays()
+        self.future = future
+        self.started_at = time.monotonic()
+        self.attempt = 0
+        self.entry_id = current_entry.get()  # status checks are scheduled as this entry's calls
+
+
+class PollManager:
+    """
+    Polls every pending search_leads request_id from one task on the provider loop.
+
+    Searches sit in a timer wheel (one slot per tick); each tick the due ones are
+    checked, each by a task of its own (at most `batch_size` at once), and either
+    resolved or re-scheduled by their PollPolicy. A slow check holds up only its
+    own search, never the wheel.
+    Waiting on hundreds of searches costs one task instead of a sleeping thread each.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, tick: float = POLL_TICK_SECONDS, batch_size: int = POLL_BATCH_SIZE):
+        self.loop = loop
+        self.tick = tick
+        self.batch_size = batch_size
+        self._wheel: Dict[int, List[_PendingSearch]] = defaultdict(list)
+        self._origin = time.monotonic()
+        self._pending_count = 0
+        self._task: Optional[asyncio.Task] = None
+        self._checks = asyncio.Semaphore(max(1, batch_size))
+        self._checks_in_flight: Set[asyncio.Task] = set()
+
+    @property
+    def pending_count(self) -> int:
+        return self._pending_count
+
+    def _now_tick(self) -> int:
+        return int((time.monotonic() - self._origin) / self.tick)
+
+    def _schedule(self, search: _PendingSearch, delay: float):
+        ticks = max(1, math.ceil(delay / self.tick))
+        self._wheel[self._now_tick() + ticks].append(search)
+
+    async def wait(self, rapidapi_key, request_id, policy: Optional[PollPolicy] = None):
+        """
+        Wait for a search; same result as api_calls_async.wait_for_results.
+        Must be awaited on the manager's loop (use submit() from anywhere else).
+        """
+        search = _PendingSearch(rapidapi_key, request_id, policy or default_poll_policy(), self.loop.create_future())
+
+        # First check goes out on the next tick
+        self._schedule(search, 0)
+        self._pending_count += 1
+
+        if self._task is None or self._task.done():
+            self._task = self.loop.create_task(self._run())
+
+        return await search.future
+
+    def submit(self, rapidapi_key, request_id, policy: Optional[PollPolicy] = None, callback: Optional[Callable] = None) -> concurrent.futures.Future:
+        """
+        Thread-safe: register a search and return a future for its result.
+        `callback`, if given, is called with that future once it resolves.
+        """
+        future = asyncio.run_coroutine_threadsafe(bind_entry(current_entry.get(), self.wait(rapidapi_key, request_id, policy)), self.loop)
+        if callback:
+            future.add_done_callback(callback)
+        return future
+
+    async def _run(self):
+        while self._pending_count:
+            await asyncio.sleep(self.tick)
+
+            # Take every slot that came due, including ones passed while checks were waiting for a slot
+            now_tick = self._now_tick()
+            due = []
+            for slot in sorted(t for t in self._wheel if t <= now_tick):
+                due.extend(self._wheel.pop(slot))
+
+            for search in due:
+                task = self.loop.create_task(self._check(search))
+                self._checks_in_flight.add(task)
+                task.add_done_callback(self._checks_in_flight.discard)
+
+    async def _check(self, search: _PendingSearch):
+        async with self._checks:
+            try:
+                status_response = await asyncio.wait_for(
+                    bind_entry(search.entry_id, api_calls_async.check_search_status(search.rapidapi_key, search.request_id)),
+                    POLL_CHECK_TIMEOUT_SECONDS,
+                )
+            except Exception as e:
+                status_response = e
+        self._handle(search, status_response)
+
+    def _resolve(self, search: _PendingSearch, result=None, error: Optional[Exception] = None):
+        self._pending_count -= 1
+        if search.future.done():
+            return  # caller went away (cancelled)
+        if error is not None:
+            search.future.set_exception(error)
+        else:
+            search.future.set_result(result)
+
+    def _handle(self, search: _PendingSearch, status_response):
+        # Status endpoint's breaker open or check timed out: the search keeps running, check again at the next delay
+        if isinstance(status_response, (CircuitOpen, asyncio.TimeoutError)):
+            next_delay = next(search.delays, None)
+            if next_delay is None or search.future.done():
+                self._resolve(search, error=status_response)
+            else:
+                self._schedule(search, max(next_delay, getattr(status_response, "retry_in", 0)))
+            return
+        if isinstance(status_response, BaseException):
+            self._resolve(search, error=status_response)
+            return
+
+        search.attempt += 1
+        status = status_response.get("status")
+        print(f"Search {search.request_id} attempt {search.attempt}: Status = {status}", flush=True)
+
+        if status == "done":
+            print("✅ Search completed.")
+            record_completion(time.monotonic() - search.started_at)
+            self._resolve(search, status_response)
+        elif status == "failed":
+            self._resolve(search, error=Exception("❌ Search failed."))
+        elif status == "pending" or status == "processing":
+            next_delay = next(search.delays, None)
+            if next_delay is None or search.future.done():
+                self._resolve(search, dict(TIMEOUT_RESULT))
+            else:
+                self._schedule(search, next_delay)
+        else:
+            print(f"⚠️ Unexpected status: {status}")
+            self._resolve(search, dict(TIMEOUT_RESULT))
+
+
+# State (per-process)
+_manager: Optional[PollManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_poll_manager() -> PollManager:
+    """
+    The process-wide manager, running on the shared provider loop.
+    """
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = PollManager(get_provider_loop())
+    return _manager
+
+
+def submit_search(rapidapi_key, request_id, policy: Optional[PollPolicy] = None, callback: Optional[Callable] = None) -> concurrent.futures.Future:
+    """
+    Hand a search_leads request_id to the poll manager; returns a future for its status.
+    """
+    return get_poll_manager().submit(rapidapi_key, request_id, policy, callback)
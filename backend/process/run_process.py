@@ -5,6 +5,8 @@ from utils.search_by_name import get_company_info_from_names
 from openai_service.ai_cleaner import translate_title
 import json
 import random
+import socket
+import uuid
 from api_calls import *
 from fixed_data.industries import find_matching_industry
 from fixed_data.list_of_industries import INDUSTRIES as all_industries
@@ -12,24 +14,1036 @@ from fixed_data.countries_id import country_ids
 from google_service.utils import *
 from typing import Dict, Any
 from cache_manager import store_processed_data, delete_processed_data
+from stores.company_store import (
+    get_cached_company,
+    save_company,
+    get_cached_revenue,
+    save_revenue,
+    is_known_not_found,
+    save_not_found,
+)
+from stores.email_pattern_store import get_email_pattern, learn_email_pattern, record_email_pattern_miss
+from stores.verification_store import get_catch_all_domains, save_catch_all_domain
+from stores.person_store import get_cached_person, save_person
+from stores.metrics_store import save_entry_metrics
+from stores.item_store import (
+    ItemCheckpoints,
+    LeaseHeartbeat,
+    claim_items,
+    release_item_leases,
+    has_leased_items,
+    has_claimable_items,
+)
+from stores.search_store import save_pending_search, get_pending_searches, delete_pending_search
+from core import metrics
 from models import SessionLocal, ProcessEntry, ProcessItem
 from fastapi.responses import JSONResponse
+from lead_stream import LeadBuffer, SearchResultsStream
+from poll_manager import submit_search
+from collections import deque
+from functools import partial
+from enrichment import LEAD_CONCURRENCY, EnrichmentStage, check_lead_email, fetch_company_and_revenue
+from core.cancellation import Cancelled, get_cancellation_token, release_cancellation_token
+from core.scheduler import current_entry, set_entry_priority
+from core.key_pool import get_env_key, get_key_id, get_key_by_id
+from core.circuit_breaker import park_while_open
+from core.http_client import submit
+import api_calls_async
 
 
 # Load .env variables
 load_dotenv()
 
 # ENV VARS
-API_KEY = os.getenv("RAPIDAPI_KEY")
-API_KEY_VERIFY = os.getenv("RAPIDAPI_KEY_VERIFY")
+API_KEY = get_env_key("RAPIDAPI_KEY")
+API_KEY_VERIFY = get_env_key("RAPIDAPI_KEY_VERIFY")
 
+# CONFIG
+# How many chunk searches may run ahead of the one being processed (0 = wait for each search)
+SEARCH_PIPELINE_DEPTH = int(os.getenv("SEARCH_PIPELINE_DEPTH", "1"))
 
-def process_entry_logic(entry_id: str):
+
+def goal_reached(run):
+    """
+    Whether the entry's goal is met: suitable leads of earlier runs and of
+    other workers on the entry (as of the last checkpoint commit) plus this run's.
+    """
+    checkpoints = run["checkpoints"]
+    suitable_count = checkpoints.entry_suitable_count - checkpoints.suitable_flushed + len(run["suitable_results"])
+    return suitable_count >= int(run["goal"])
+
+
+def get_company_lookup_domains(db, clean_domain):
+    """
+    Domains to try with get_company_by_domain, in order: the domain itself,
+    then its simplified form, skipping the ones recently not found.
+    """
+    simplified_domain = ".".join(clean_domain.split(".")[-2:])
+
+    lookup_domains = []
+    for domain in dict.fromkeys([clean_domain, simplified_domain]):
+        if is_known_not_found(db, domain):
+            print(f"Domain '{domain}' was recently not found on Linkedin, skipping lookup.")
+            continue
+        lookup_domains.append(domain)
+
+    return lookup_domains
+
+
+def mark_chunk_unsuitable(run, chunk, company_data_map, status):
+    """
+    Write every company of a chunk to the unsuitable tab with the same status.
+    """
+    for comp_id in chunk:
+        comp_data = company_data_map[comp_id]
+        unsuitable_data = {
+            "Company Name": comp_data['company_name'],
+            "domain": comp_data['domain'],
+            "employees": comp_data['employee_range'],
+            "employees_prooflink": comp_data['employees_prooflink'],
+            "subindustry": comp_data['subindustry'],
+            "industry": comp_data['industry'],
+            "revenue": comp_data['revenue'],
+            "revenue_prooflink": comp_data['revenue_prooflink'],
+            "first_name": "-",
+            "last_name": "-",
+            "title": "-",
+            "prooflink": "-",
+            "location": "-",
+            "status": status,
+            "email": "-",
+            "email_status": "-",
+            "last_activity": "-"
+        }
+        run["unsuitable_results"].append(unsuitable_data)
+        write_results_in_tab(run["sheet"], run["suitable_results"], run["unsuitable_results"], "unsuitable", unsuitable_data)
+        run["checkpoints"].mark(comp_data["item_value"], "processed", leads={"suitable": 0, "unsuitable": 1})
+
+
+def get_requirement_filters(requirement):
+    """
+    Keywords, job functions and levels of one requirement from the form.
+    """
+    # Define keywords ***********************
+    modifed_keywords = requirement.get("keywords", "").replace("keywords", "").replace("/", ",").replace(":", "")
+    keywords = [x.strip() for x in modifed_keywords.split(",") if x.strip()]
+
+    # Define functions **********************
+    job_functions = requirement.get("job_function")
+    if job_functions == ['any']:
+        job_functions = []
+
+    job_functions = ["Operations" if item == "Business operations" else item for item in job_functions]
+
+    # Define levels **************************
+    level1 = requirement.get("level1", [])
+    level2 = requirement.get("level2", [])
+    level3 = requirement.get("level3", [])
+    levels = get_job_levels(level1, level2, level3)
+
+    return keywords, job_functions, levels
+
+
+def build_search_request(run, chunk, keywords, job_functions, geo_codes):
+    return {
+        "current_company_ids": chunk,
+        "title_keywords": keywords[:20],
+        "functions": job_functions, 
+        "geo_codes": geo_codes,
+        "geo_codes_exclude": [],
+        "title_keywords_exclude": run["exclude_keywords"],
+        "past_company_ids": [],
+        "keywords": [],
+        "limit": len(chunk) * 2 * int(run["lpc"])
+    }
+
+
+def prepare_domain(run, domain, sup_domains):
+    """
+    Checks that need no provider call, and what is already cached.
+    Returns an enrichment job (lookup, fetch) for the EnrichmentStage, or
+    None when the domain was written to the unsuitable tab.
+    """
+    db = run["db"]
+    sheet = run["sheet"]
+    suitable_results = run["suitable_results"]
+    unsuitable_results = run["unsuitable_results"]
+
+    if not domain or "." not in domain or domain.startswith("linkedin.com"):
+                        
+        unsuitable_data = {
+            "Company Name": "-",
+            "domain": domain,
+            "employees": "-",
+            "employees_prooflink": "-",
+            "subindustry": "-",
+            "industry": "-",
+            "revenue": "-",
+            "revenue_prooflink": "-",
+            "first_name": "-",
+            "last_name": "-",
+            "title": "-",
+            "prooflink": "-",
+            "location": "-",
+            "status": "bad domain",
+            "email": "-",
+            "email_status": "-",
+            "last_activity": "-"
+        }
+
+        unsuitable_results.append(unsuitable_data)
+        write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data) 
+
+        return None
+
+    clean_domain = get_clean_domain(domain)
+
+    # Check if domain in sup list
+    if sup_domains and clean_domain in sup_domains:
+        print(f"The domain ('{clean_domain}') in sup list.")
+        
+        unsuitable_data = {
+            "Company Name": "-",
+            "domain": clean_domain,
+            "employees": "-",
+            "employees_prooflink": "-",
+            "subindustry": "-",
+            "industry": "-",
+            "revenue": "-",
+            "revenue_prooflink": "-",
+            "first_name": "-",
+            "last_name": "-",
+            "title": "-",
+            "prooflink": "-",
+            "location": "-",
+            "status": "sup domain",
+            "email": "-",
+            "email_status": "-",
+            "last_activity": "-"
+        }
+
+        unsuitable_results.append(unsuitable_data)
+        write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data) 
+
+        return None
+
+    company_data = get_cached_company(db, clean_domain)
+    is_company_cached = company_data is not None
+    is_revenue_cached, revenue_data = get_cached_revenue(db, clean_domain)
+
+    lookup = {
+        "value": domain,
+        "clean_domain": clean_domain,
+        "company_data": company_data,
+        "is_company_cached": is_company_cached,
+        "revenue_data": revenue_data,
+        "is_revenue_cached": is_revenue_cached,
+    }
+
+    lookup_domains = [] if is_company_cached else get_company_lookup_domains(db, clean_domain)
+    # Every lookup domain is known dead: the company is written off, its revenue isn't needed
+    dead_domain = not is_company_cached and not lookup_domains
+    revenue_domain = None if is_revenue_cached or dead_domain else clean_domain
+
+    if not lookup_domains and not revenue_domain:
+        return lookup, None
+
+    return lookup, partial(fetch_company_and_revenue, API_KEY, lookup_domains, revenue_domain)
+
+
+def enrich_domain(run, lookup, fetched, sup_names):
+    """
+    Store the fetched company and revenue data and compare it with the user input.
+    Returns the company data to search leads for, or None when the domain
+    was written to the unsuitable tab.
+    """
+    db = run["db"]
+    entry = run["entry"]
+    data = run["data"]
+    sheet = run["sheet"]
+    suitable_results = run["suitable_results"]
+    unsuitable_results = run["unsuitable_results"]
+
+    clean_domain = lookup["clean_domain"]
+    company_data = lookup["company_data"]
+    is_company_cached = lookup["is_company_cached"]
+    revenue_data = lookup["revenue_data"]
+    is_revenue_cached = lookup["is_revenue_cached"]
+
+    if fetched:
+        company_lookups, fetched_revenue = fetched
+
+        for lookup_domain, lookup_data in company_lookups.items():
+            if isinstance(lookup_data, NotFound):
+                save_not_found(db, lookup_domain)
+
+        if not is_company_cached:
+            company_data = next(reversed(company_lookups.values()), {})
+
+        if not is_revenue_cached:
+            revenue_data = fetched_revenue
+            # None: the revenue search failed; it is asked again next time instead of cached as none
+            if revenue_data is not None:
+                save_revenue(db, clean_domain, revenue_data)
+    elif not is_company_cached:
+        company_data = {}
+
+    if company_data == "No more credits for domain API":
+        entry.status = "Failed"
+        entry.error_message = "No more credits"
+        db.commit()
+        db.refresh(entry)
+
+        raise Exception("No more credits")
+
+    if company_data == "Subscription is suspended":
+        entry.status = "Failed"
+        entry.error_message = "Subscription is suspended. Contact admin for renewal"
+        db.commit()
+        db.refresh(entry)
+
+        raise Exception("Subscription is suspended. Contact admin for renewal")
+
+    if isinstance(company_data, dict) and company_data and not is_company_cached:
+        save_company(db, clean_domain, company_data)
+                
+    if not company_data:
+
+        print(f"The API was not able to find the domain on Linkedin ('{clean_domain}').You will not be charged for this request.")
+        
+        unsuitable_data = {
+            "Company Name": "-",
+            "domain": clean_domain,
+            "employees": "-",
+            "employees_prooflink": "-",
+            "subindustry": "-",
+            "industry": "-",
+            "revenue": "-",
+            "revenue_prooflink": "-",
+            "first_name": "-",
+            "last_name": "-",
+            "title": "-",
+            "prooflink": "-",
+            "location": "-",
+            "status": "domain not found in linkedin",
+            "email": "-",
+            "email_status": "-",
+            "last_activity": "-"
+        }
+
+        unsuitable_results.append(unsuitable_data)
+        write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data) 
+
+        return None
+                    
+    company_name = company_data.get('company_name', 'no info')
+    employee_range = company_data.get('employee_range', 'no info')
+    employee_count = company_data.get('employee_count', 'no info')
+    employees_prooflink = company_data.get('linkedin_url', 'no info')
+    company_id = company_data.get('company_id', 'no info')
+
+    # Check if company name in sup list
+    if sup_names:
+        lower_list = [item.lower() for item in sup_names]
+        lower_name = company_name.lower()
+        if lower_name in lower_list:
+            print(f"The company ('{company_name}') in sup list.")
+            
+            unsuitable_data = {
+                "Company Name": company_name,
+                "domain": clean_domain,
+                "employees": employee_range,
+                "employees_prooflink": employees_prooflink,
+                "subindustry": "",
+                "industry": "",
+                "revenue": "",
+                "revenue_prooflink": "",
+                "first_name": "-",
+                "last_name": "-",
+                "title": "-",
+                "prooflink": "-",
+                "location": "-",
+                "status": "sup name",
+                "email": "-",
+                "email_status": "-",
+                "last_activity": "-"
+            }
+
+            unsuitable_results.append(unsuitable_data)
+            write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data) 
+
+            return None
+    
+    if len(company_data.get('industries', ['no info'])) > 0:
+        subindustry = company_data.get('industries', ['no info'])[0]
+        industries = find_matching_industry(subindustry) if subindustry != 'no info' else 'no info'
+    else:
+        subindustry = None
+        industries = None
+
+    if revenue_data:
+        revenue = revenue_data[0]
+        revenue_prooflink = revenue_data[1]
+    else:
+        revenue = None
+        revenue_prooflink = None
+
+    print(f"✅ Done Step 2 (Get company revenue: '/search')")
+
+    input_size = data["size"]
+    input_industry = data["industry"]
+    input_revenue = data["revenue"]
+
+    input_data = {
+        "input_industry": input_industry,
+        "input_size": input_size,
+        "input_revenue": input_revenue,
+    }
+
+    if not revenue:
+        revenue = "-"
+        revenue_prooflink = "-"
+
+    if not subindustry:
+        subindustry = "-"
+        industries = "-"
+
+    if not employee_count or employee_count == 0 or employee_count == "0":
+        employee_range = "-"
+
+    scraped_company_data = {
+        "industry": industries,
+        "employees": employee_range,
+        "revenue": revenue,
+    }
+
+    compared_data_info = compare_data(input_data, scraped_company_data)
+
+    if not compared_data_info["is_valid"]:
+        unsuitable_data = {
+            "Company Name": company_name,
+            "domain": clean_domain,
+            "employees": employee_range,
+            "employees_prooflink": employees_prooflink,
+            "subindustry": subindustry,
+            "industry": industries,
+            "revenue": revenue,
+            "revenue_prooflink": revenue_prooflink,
+            "first_name": "-",
+            "last_name": "-",
+            "title": "-",
+            "prooflink": "-",
+            "location": "-",
+            "status": compared_data_info["status"],
+            "email": "-",
+            "email_status": "-",
+            "last_activity": "-"
+        }
+
+        unsuitable_results.append(unsuitable_data)
+        write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
+        
+        return None
+
+    print(f"✅ Done Step 3 (Compare company data with user input)")
+
+    return {
+        'company_id': company_id,
+        'company_name': company_name,
+        'domain': clean_domain,
+        'employee_range': employee_range,
+        'employees_prooflink': employees_prooflink,
+        'subindustry': subindustry,
+        'industry': industries,
+        'revenue': revenue,
+        'revenue_prooflink': revenue_prooflink,
+        'company_data': company_data
+    }
+
+
+def submit_chunk_search(run, chunk, company_data_map):
+    """
+    Submit the lead search for a chunk of companies without waiting for it.
+    Returns the search job, or None if no request_id came back.
+    """
+    data = run["data"]
+
+    # Define geo codes
+    selected_countries = data.get("geo")
+    if "select_all_countries" in selected_countries:
+        geolocations = list(country_ids.keys())
+    else:
+        geolocations = selected_countries
+    
+    geo_codes = [country_ids[country] for country in geolocations][:20]
+
+    keywords, job_functions, levels = get_requirement_filters(data.get("requirements")[0])
+
+    # Store in global cache for frontend access
+    store_processed_data(run["entry_id"], {
+        "job_levels": levels,
+        "job_functions": job_functions,
+        "keywords": keywords,
+        "geo_locations": geolocations,
+        "entry_name": run["entry"].name 
+    })
+
+    data_request = build_search_request(run, chunk, keywords, job_functions, geo_codes)
+
+    print(f"\n{data_request}\n")
+
+    # Step 4 - Search leads
+    request_id = submit_search_request(run, data_request)
+
+    if not request_id:
+        print("❌ No request_id returned.")
+        mark_chunk_unsuitable(run, chunk, company_data_map, "search failed")
+        return None
+
+    filters = {
+        "keywords": keywords,
+        "job_functions": job_functions,
+        "levels": levels,
+        "geo_codes": geo_codes,
+        "geolocations": geolocations,
+        "requirement_index": 0,
+    }
+    save_pending_search(run["db"], run["entry_id"], request_id, chunk, filters, api_key_id=get_key_id(api_calls_async.get_search_key(request_id)))
+
+    for comp_id in chunk:
+        run["checkpoints"].mark(company_data_map[comp_id]["item_value"], "searching", request_id=request_id)
+
+    return {
+        "chunk": chunk,
+        "company_data_map": company_data_map,
+        "request_id": request_id,
+        "future": submit_search(API_KEY, request_id),
+        **filters,
+    }
+
+
+def reattach_search(run, pending, restored_companies, restored_request_ids):
+    """
+    Wait again for a search an earlier run submitted, for the companies of its
+    chunk that are not processed yet (taken out of `restored_companies`).
+    Returns the search job, or None when none of its companies are left.
+    """
+    request_id = pending["request_id"]
+    values_by_company_id = {
+        restored_companies[value]["company_id"]: value
+        for value, item_request_id in restored_request_ids.items()
+        if str(item_request_id) == request_id and value in restored_companies
+    }
+
+    chunk = []
+    company_data_map = {}
+    for company_id in pending["company_ids"]:
+        value = values_by_company_id.get(company_id)
+        if value is None:
+            continue
+        company_info = dict(restored_companies.pop(value))
+        company_info.pop("company_id")
+        company_info["item_value"] = value
+        chunk.append(company_id)
+        company_data_map[company_id] = company_info
+
+    if not chunk:
+        forget_search(run["db"], request_id)
+        return None
+
+    print(f"🔁 Re-attaching to search {request_id} ({len(chunk)} companies)")
+
+    # Status and results are only served to the key that submitted the search
+    api_calls_async.restore_search_key(request_id, get_key_by_id(pending.get("api_key_id")))
+
+    return {
+        "chunk": chunk,
+        "company_data_map": company_data_map,
+        "request_id": request_id,
+        "future": submit_search(API_KEY, request_id),
+        **pending["filters"],
+    }
+
+
+def finish_chunk_search(run, job):
+    """
+    Process a chunk's search results, then forget its pending search.
+    """
+    process_chunk_results(run, job)
+    forget_search(run["db"], job["request_id"])
+
+
+def forget_search(db, request_id):
+    """
+    Drop a search whose results are processed (or that was replaced), in the DB and in memory.
+    """
+    delete_pending_search(db, request_id)
+    api_calls_async.forget_search_key(request_id)
+
+
+def process_chunk_results(run, job):
+    """
+    Wait for a chunk's search and process its leads (title, geo, email, activity checks).
+    """
+    db = run["db"]
+    entry = run["entry"]
+    entry_id = run["entry_id"]
+    data = run["data"]
+    sheet = run["sheet"]
+    suitable_results = run["suitable_results"]
+    unsuitable_results = run["unsuitable_results"]
+    is_company_geo_required = run["is_company_geo_required"]
+    domains_and_countries = run["domains_and_countries"]
+    sup_emails = run["sup_emails"]
+    lpc = run["lpc"]
+    token = run["token"]
+    checkpoints = run["checkpoints"]
+
+    chunk = job["chunk"]
+    company_data_map = job["company_data_map"]
+    request_id = job["request_id"]
+    keywords = job["keywords"]
+    levels = job["levels"]
+    geo_codes = job["geo_codes"]
+    geolocations = job["geolocations"]
+    requirement_index = job.get("requirement_index", 0)
+
+    # Wait for results
+    check_search_data = token.wait(job["future"])
+
+    if check_search_data["status"] != "done":
+        print("❌ Timed out waiting for result.")
+        mark_chunk_unsuitable(run, chunk, company_data_map, "search timeout")
+        return
+
+    lead_count = check_search_data.get("total_count", 0) or 0
+
+    print(f"Lead count = {lead_count}")
+
+    if lead_count == 0:
+        
+        # ///////////////////////////////////////////////////////////////////////////////////////////////////
+        # //////////////////////// Try search again if there are other requirements /////////////////////////
+        # ///////////////////////////////////////////////////////////////////////////////////////////////////
+
+        for requirement_index, requirement in enumerate(data.get("requirements")[requirement_index + 1:], start=requirement_index + 1):
+
+            keywords, job_functions, levels = get_requirement_filters(requirement)
+
+            # Store in global cache for frontend access
+            store_processed_data(entry_id, {
+                "job_levels": levels,
+                "job_functions": job_functions,
+                "keywords": keywords,
+                "geo_locations": geolocations,
+                "entry_name": entry.name 
+            })
+
+            data_request = build_search_request(run, chunk, keywords, job_functions, geo_codes)
+
+            print(f"\n{data_request}\n")
+
+            # Search leads
+            forget_search(db, request_id)
+            request_id = submit_search_request(run, data_request)
+            job["request_id"] = request_id
+
+            if not request_id:
+                print("❌ No request_id returned.")
+                mark_chunk_unsuitable(run, chunk, company_data_map, "search failed")
+                return
+
+            save_pending_search(db, entry_id, request_id, chunk, {
+                "keywords": keywords,
+                "job_functions": job_functions,
+                "levels": levels,
+                "geo_codes": geo_codes,
+                "geolocations": geolocations,
+                "requirement_index": requirement_index,
+            }, api_key_id=get_key_id(api_calls_async.get_search_key(request_id)))
+            for comp_id in chunk:
+                checkpoints.mark(company_data_map[comp_id]["item_value"], "searching", request_id=request_id)
+
+            # Wait for results ////////////////////////////////////////////////////////////////////////////
+            check_search_data = token.wait(submit_search(API_KEY, request_id))
+
+            if check_search_data["status"] != "done":
+                print("❌ Timed out waiting for result.")
+                mark_chunk_unsuitable(run, chunk, company_data_map, "search timeout")
+                return
+            
+            lead_count = check_search_data.get("total_count", 0) or 0
+
+            print(f"Lead count = {lead_count}")
+
+            if lead_count > 0: 
+                break
+
+        else:
+            # ////////////////////////////// End of search when lead count still 0 //////////////////////////////
+            mark_chunk_unsuitable(run, chunk, company_data_map, "no leads")
+            return
+
+    last_count = lead_count
+
+    print(f"=============================== {last_count} =========================================")
+    if last_count > 0:
+        leads_stream = SearchResultsStream(API_KEY, request_id, total_count=last_count, token=token)
+        print(f"✅ Done Step 5 (Get search results: 'search-results/')")
+
+        leads = checked_leads = None
+        try:
+            # Process leads for each company in the chunk
+            for comp_id in chunk:
+                comp_data = company_data_map[comp_id]
+
+                # Process leads for this company, page by page until lpc is met
+                temp_lead_valid_count = 0
+                has_company_leads = False
+                unsuitable_count_before = len(unsuitable_results)
+
+                for company_leads in leads_stream.batches_for(comp_id):
+                    has_company_leads = True
+                    leads = LeadBuffer(entry_id)
+
+                    print(f"✅ Done Step 7 (Store leads data for find 'lpc' in next steps)")
+
+                    for lead in company_leads:
+                        first_name = lead.get("first_name", "-")
+                        last_name = lead.get("last_name", "-")
+                        title = lead.get("job_title", "-")
+                        linkedin_url = lead.get("linkedin_url", "-")
+                        location = lead.get("location", "-")
+
+                        # Check lead title 
+                        title_states = []
+                        is_valid_title = check_lead_title(title, levels)
+
+                        # Translate title if need
+                        if not is_valid_title:
+                            try:
+                                try_to_translate_title = translate_title(title)
+
+                                if try_to_translate_title:
+                                    title = try_to_translate_title
+                                    is_valid_title = check_lead_title(title, levels)
+                                    print(f"TITLE AFTER :: {title}")
+                            except:
+                                pass
+
+                        title_states.append(is_valid_title)
+
+                        # Compare keywords and titles 
+                        if keywords:
+
+                            lowercase_list_of_keywords = [item.lower() for item in keywords]
+
+                            compared_keywords = any(word.lower() in title.lower().split() for word in lowercase_list_of_keywords)
+                            is_valid_keyword = compared_keywords
+
+                            title_states.append(is_valid_keyword)
+
+                        if False in title_states:
+                            unsuitable_data = {
+                                "Company Name": comp_data['company_name'],
+                                "domain": comp_data['domain'],
+                                "employees": comp_data['employee_range'],
+                                "employees_prooflink": comp_data['employees_prooflink'],
+                                "subindustry": comp_data['subindustry'],
+                                "industry": comp_data['industry'],
+                                "revenue": comp_data['revenue'],
+                                "revenue_prooflink": comp_data['revenue_prooflink'],
+                                "first_name": first_name,
+                                "last_name": last_name,
+                                "title": title,
+                                "prooflink": linkedin_url,
+                                "location": location,
+                                "status": "h title",
+                                "email": "-",
+                                "email_status": "-",
+                                "last_activity": "-"
+                            }
+
+                            unsuitable_results.append(unsuitable_data)
+                            write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
+
+                            continue
+
+                        # Check lead geo if required
+                        if is_company_geo_required:
+                            if domains_and_countries.get(comp_data['domain'], "").lower() not in location.lower():
+                                unsuitable_data = {
+                                    "Company Name": comp_data['company_name'],
+                                    "domain": comp_data['domain'],
+                                    "employees": comp_data['employee_range'],
+                                    "employees_prooflink": comp_data['employees_prooflink'],
+                                    "subindustry": comp_data['subindustry'],
+                                    "industry": comp_data['industry'],
+                                    "revenue": comp_data['revenue'],
+                                    "revenue_prooflink": comp_data['revenue_prooflink'],
+                                    "first_name": first_name,
+                                    "last_name": last_name,
+                                    "title": title,
+                                    "prooflink": linkedin_url,
+                                    "location": location,
+                                    "status": "h geo",
+                                    "email": "-",
+                                    "email_status": "-",
+                                    "last_activity": "-"
+                                }
+                                unsuitable_results.append(unsuitable_data)
+                                write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
+                                continue
+
+                        # Defer activity check until after email validation
+                        last_activity = "-"
+
+                        person_data = {
+                            "first_name": first_name,
+                            "last_name": last_name,
+                            "domain": comp_data['domain'],
+                            "linkedin_url": linkedin_url,
+                            "location": location,
+                            "title": title,
+                            "last_activity": last_activity
+                        }
+
+                        leads.append(person_data)
+
+                    def lead_jobs():
+                        for person in leads:
+                            if "?" in person["first_name"] or "?" in person["last_name"]:
+                                unsuitable_data = { 
+                                    "Company Name": comp_data['company_name'], 
+                                    "domain": comp_data['domain'], 
+                                    "employees": comp_data['employee_range'], 
+                                    "employees_prooflink": comp_data['employees_prooflink'], 
+                                    "subindustry": comp_data['subindustry'], 
+                                    "industry": comp_data['industry'], 
+                                    "revenue": comp_data['revenue'], 
+                                    "revenue_prooflink": comp_data['revenue_prooflink'], 
+                                    "first_name": person["first_name"], 
+                                    "last_name": person["last_name"], 
+                                    "title": person["title"], 
+                                    "prooflink": person["linkedin_url"], 
+                                    "location": person["location"], 
+                                    "status": "", 
+                                    "email": "-", 
+                                    "email_status": "email not found", 
+                                    "last_activity": "-", 
+                                } 
+                                unsuitable_results.append(unsuitable_data) 
+                                write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data) 
+
+                                continue 
+
+                            email_pattern = get_email_pattern(db, person["domain"])
+                            mail_domains = [person["domain"], ".".join(person["domain"].split(".")[-2:])]
+                            if email_pattern:
+                                mail_domains.append(email_pattern[1])
+                            catch_all_domains = frozenset(get_catch_all_domains(db, mail_domains))
+
+                            cached_person = get_cached_person(db, person)
+                            if cached_person:
+                                metrics.increment(entry_id, "person_cache_hits")
+
+                            yield person, partial(check_lead_email, person, API_KEY_VERIFY, sup_emails, email_pattern, catch_all_domains, cached_person)
+
+                    # ///////////////////////////////////////////////////////////////////////////////////////////////////
+                    # ///////////////////////////////// EMAIL FIND STEP /////////////////////////////////////////////////
+                    # ///////////////////////////////////////////////////////////////////////////////////////////////////
+
+                    # Several leads are found / verified at once; results come back in search order
+                    # so lpc keeps the best ranked leads, and the checks still in flight once it is
+                    # met are cancelled (closing checked_leads) and their results never used
+                    checked_leads = EnrichmentStage(concurrency=LEAD_CONCURRENCY, order="input", token=token).run(lead_jobs())
+
+                    for person, lead_email in checked_leads:
+                        token.raise_if_cancelled()
+
+                        # Never more suitable leads than lpc for a company
+                        if temp_lead_valid_count >= int(lpc):
+                            break
+
+                        email = lead_email["email"]
+                        email_status = lead_email["email_status"]
+
+                        # Learn the company's email pattern from verified addresses
+                        if lead_email["pattern_valid"] is False:
+                            record_email_pattern_miss(db, person["domain"])
+                        if lead_email["verify_status"] == "valid" and lead_email["fetched"]["verify"]:
+                            learn_email_pattern(db, person["domain"], person["first_name"], person["last_name"], email)
+
+                        # Remember catch-all domains so later addresses there are not verified again
+                        if lead_email["verify_status"] == "accept_all" and lead_email["fetched"]["verify"]:
+                            save_catch_all_domain(db, email.partition("@")[2])
+                        metrics.increment(entry_id, "verify_calls_saved_catch_all", lead_email["verify_calls_saved"])
+
+                        save_person(db, person, lead_email)
+
+                        scraped_data = {
+                            "Company Name": comp_data['company_name'],
+                            "domain": comp_data['domain'],
+                            "employees": comp_data['employee_range'],
+                            "employees_prooflink": comp_data['employees_prooflink'],
+                            "subindustry": comp_data['subindustry'],
+                            "industry": comp_data['industry'],
+                            "revenue": comp_data['revenue'],
+                            "revenue_prooflink": comp_data['revenue_prooflink'],
+                            "first_name": person["first_name"],
+                            "last_name": person["last_name"], 
+                            "title": person["title"],
+                            "prooflink": person["linkedin_url"],
+                            "location": person["location"],
+                            "status": "",
+                            "email": email,
+                            "email_status": email_status,
+                            "last_activity": "-",
+                        }
+
+                        if email_status == "valid" or email_status == "accept_all":
+                            # Now that we have a valid email, check lead activity
+                            computed_last_activity = "-"
+                            profile_activity = lead_email["profile_activity"]
+
+                            if profile_activity is not None:
+                                if profile_activity == "No more credits for domain API" or profile_activity == "Subscription is suspended":
+                                    entry.status = "Failed"
+                                    entry.error_message = "Subscription is suspended. Contact admin for renewal"
+                                    db.commit()
+                                    db.refresh(entry)
+                                    raise Exception("Subscription is suspended. Contact admin for renewal")
+
+                                computed_last_activity = profile_activity.get("recent_activity_time", "-")
+
+                            # If activity indicates years-old, mark as unsuitable due to activity
+                            if computed_last_activity and "yr" in computed_last_activity.lower():
+                                unsuitable_data = {
+                                    "Company Name": comp_data['company_name'],
+                                    "domain": comp_data['domain'],
+                                    "employees": comp_data['employee_range'],
+                                    "employees_prooflink": comp_data['employees_prooflink'],
+                                    "subindustry": comp_data['subindustry'],
+                                    "industry": comp_data['industry'],
+                                    "revenue": comp_data['revenue'],
+                                    "revenue_prooflink": comp_data['revenue_prooflink'],
+                                    "first_name": person["first_name"],
+                                    "last_name": person["last_name"],
+                                    "title": person["title"],
+                                    "prooflink": person["linkedin_url"],
+                                    "location": person["location"],
+                                    "status": "activity",
+                                    "email": email,
+                                    "email_status": email_status,
+                                    "last_activity": computed_last_activity,
+                                }
+                                unsuitable_results.append(unsuitable_data)
+                                write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
+                            else:
+                                # Otherwise proceed as suitable with activity info
+                                scraped_data["last_activity"] = computed_last_activity
+                                suitable_results.append(scraped_data)
+                                temp_lead_valid_count += 1
+                                write_results_in_tab(sheet, suitable_results, unsuitable_results, "suitable", scraped_data)
+                        else:
+                            scraped_data["last_activity"] = "-"
+                            unsuitable_results.append(scraped_data)
+                            write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", scraped_data)
+
+                        # Check LPC limit
+                        if temp_lead_valid_count >= int(lpc):
+                            break
+
+                    checked_leads.close()
+                    leads.close()
+
+                    # No need for further pages once lpc is met
+                    if temp_lead_valid_count >= int(lpc):
+                        break
+
+                if not has_company_leads:
+                    # No leads for this specific company
+                    unsuitable_data = {
+                        "Company Name": comp_data['company_name'],
+                        "domain": comp_data['domain'],
+                        "employees": comp_data['employee_range'],
+                        "employees_prooflink": comp_data['employees_prooflink'],
+                        "subindustry": comp_data['subindustry'],
+                        "industry": comp_data['industry'],
+                        "revenue": comp_data['revenue'],
+                        "revenue_prooflink": comp_data['revenue_prooflink'],
+                        "first_name": "-",
+                        "last_name": "-",
+                        "title": "-",
+                        "prooflink": "-",
+                        "location": "-",
+                        "status": "no leads",
+                        "email": "-",
+                        "email_status": "-",
+                        "last_activity": "-"
+                    }
+                    unsuitable_results.append(unsuitable_data)
+                    write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
+
+                checkpoints.mark(comp_data["item_value"], "processed", leads={
+                    "suitable": temp_lead_valid_count,
+                    "unsuitable": len(unsuitable_results) - unsuitable_count_before,
+                })
+
+                # Check overall goal
+                if goal_reached(run):
+                    entry.status = "Done"
+                    db.commit()
+                    break
+        finally:
+            # Done, stopped or failed: cancel the lead checks still in flight, remove the
+            # spilled leads file and drop the page being prefetched
+            if checked_leads is not None:
+                checked_leads.close()
+            if leads is not None:
+                leads.close()
+            leads_stream.close()
+
+
+def submit_search_request(run, data_request):
+    """
+    search_leads for a chunk, parked while the endpoint's breaker is open;
+    gives up with Cancelled when the entry is stopped.
+    """
+    return run["token"].wait(submit(park_while_open(partial(api_calls_async.search_leads, API_KEY, data_request))))
+
+
+def no_edit_response(db, entry):
+    """
+    The sheet can't be written to; fail the entry (so it can be resumed once
+    access is given) and tell the caller.
+    """
+    entry.status = "Failed"
+    entry.error_message = "The access for editing is needed."
+    db.commit()
+
+    return JSONResponse(
+        status_code=400,
+        content={"error": "no_edit"}
+    )
+
+
+def process_entry_logic(entry_id: str, join: bool = False):
     """
     Core processing logic for an entry.
     Can be used by both /process (new) and /resume (stopped).
+
+    Items are leased from the DB in batches (stores/item_store.py), so other
+    workers can process the same entry at once; `join` is set for those, which
+    leave the entry's one-time setup (duplicate rows) to the first run.
     """
     db = SessionLocal()
+    token = get_cancellation_token(entry_id)
+    checkpoints = None
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    heartbeat = LeaseHeartbeat(entry_id, worker_id)
+    # Provider calls made from this thread are scheduled as the entry's
+    entry_scope = current_entry.set(entry_id)
 
     try:
         # Get main entry
@@ -38,9 +1052,17 @@ def process_entry_logic(entry_id: str):
             print(f"Entry {entry_id} not found")
             return
 
-        # Optional: mark entry as in progress
-        entry.status = "In Progress"
+        # Mark entry as in progress, unless a /stop came in since it was claimed
+        started = db.query(ProcessEntry)\
+            .filter(ProcessEntry.id == entry_id, ProcessEntry.is_stopped.isnot(True))\
+            .update({"status": "In Progress"}, synchronize_session=False)
         db.commit()
+        if not started:
+            print(f"⏹️ Entry {entry_id} was stopped before it started")
+            return
+        db.refresh(entry)
+
+        set_entry_priority(entry_id, entry.priority)
 
         # Load user input from entry.input_data
         raw_data = entry.input_data or {}
@@ -84,10 +1106,7 @@ def process_entry_logic(entry_id: str):
                 try:
                     read_sheet_response = read_company_data_mixed(sheet_url)
                 except RuntimeError:
-                    return JSONResponse(
-                        status_code=400,
-                        content={"error": "no_edit"}
-                    )
+                    return no_edit_response(db, entry)
 
                 if read_sheet_response["message"]:
                     entry.status = "Failed"
@@ -110,10 +1129,7 @@ def process_entry_logic(entry_id: str):
                 try:
                     read_sheet_response = read_company_domains(sheet_url, is_company_geo_required)
                 except RuntimeError:
-                    return JSONResponse(
-                        status_code=400,
-                        content={"error": "no_edit"}
-                    )
+                    return no_edit_response(db, entry)
                 
                 if not read_sheet_response["message"]: 
                     values = read_sheet_response["domains"]
@@ -136,10 +1152,7 @@ def process_entry_logic(entry_id: str):
                 try:
                     read_sheet_response_by_name = read_company_names(sheet_url, is_company_geo_required)
                 except RuntimeError:
-                    return JSONResponse(
-                        status_code=400,
-                        content={"error": "no_edit"}
-                    )
+                    return no_edit_response(db, entry)
                 
                 sheet_for_names = read_sheet_response_by_name["sheet"]
                 
@@ -383,10 +1396,7 @@ def process_entry_logic(entry_id: str):
             try:
                 read_sheet_response = read_company_domains(sheet_url, is_company_geo_required)
             except RuntimeError:
-                return JSONResponse(
-                    status_code=400,
-                    content={"error": "no_edit"}
-                )
+                return no_edit_response(db, entry)
             
             if read_sheet_response["message"]:
                 entry.status = "Failed"
@@ -404,10 +1414,7 @@ def process_entry_logic(entry_id: str):
             try:
                 read_sheet_response_by_name = read_company_names(sheet_url, is_company_geo_required)
             except RuntimeError:
-                return JSONResponse(
-                    status_code=400,
-                    content={"error": "no_edit"}
-                )
+                return no_edit_response(db, entry)
             
             if read_sheet_response_by_name["message"]:
                 entry.status = "Failed"
@@ -433,11 +1440,10 @@ def process_entry_logic(entry_id: str):
         for y in items_2:
             print(f"################ {y.value} -- {y.status}")
 
-        requirements_count = len(data["requirements"])
         
         values_to_process, duplicate_values = remove_duplicates(values_to_process)
 
-        if duplicate_values:
+        if duplicate_values and not join:
             for dup_val in duplicate_values:
                 unsuitable_data = {
                     "Company Name": dup_val,
@@ -462,7 +1468,7 @@ def process_entry_logic(entry_id: str):
                 unsuitable_results.append(unsuitable_data)
                 write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
 
-        if not values_to_process and process_type == "search_by_domain":
+        if not values_to_process and not entry.items and process_type == "search_by_domain":
             entry = db.query(ProcessEntry).get(entry_id)
             entry.status = "Failed"
             entry.error_message = "No domains"
@@ -471,8 +1477,17 @@ def process_entry_logic(entry_id: str):
 
             raise Exception("No domains")
 
+        # Country of every row, keyed by clean domain: items restored from a checkpoint or
+        # taken over from another worker are not in values_to_process but need it too
+        domains_and_countries = {}
         if is_company_geo_required and country_names:
-            domains_and_countries = dict(zip(values_to_process, country_names))
+            if process_type == "search_by_domain":
+                sheet_values = read_sheet_response["domains"]
+            else:
+                sheet_values = [row.value for row in db.query(ProcessItem.value).filter_by(entry_id=entry_id).order_by(ProcessItem.id)]
+            for value, country in zip(sheet_values, country_names):
+                if value:
+                    domains_and_countries.setdefault(get_clean_domain(str(value)), country)
 
         # suitable_results = []
         # unsuitable_results = []
@@ -494,6 +1509,8 @@ def process_entry_logic(entry_id: str):
         
         register_flush_on_exit(sheet)
 
+        checkpoints = ItemCheckpoints(db, entry_id, owner=worker_id, before_commit=partial(flush_all_buffers, sheet))
+
         sup_domains_sheet_url = data["sup_domains_sheet_url"]
         sup_emails_sheet_url = data["sup_emails_sheet_url"]
 
@@ -523,997 +1540,161 @@ def process_entry_logic(entry_id: str):
         else:
            sup_emails = None 
 
-        keywords = []
-        job_functions = []
-        levels = []
-        geo_codes = []
-        lpc = 1
-        goal = 1
-
-        for idx, domain in enumerate(random.sample(values_to_process, len(values_to_process)), start=1):
-            
-            db.refresh(entry)
-            if entry.is_stopped:
-                print(f"⏹️ Stopped at row {idx}")
-                entry.last_processed_row = idx
-                db.commit()
-
-                break
-
-            print(f"\n⏳ Processing company {idx} \n")
-            print(f"Domain:: {domain}")
-            
-            if not domain or "." not in domain or domain.startswith("linkedin.com"):
-                                
-                unsuitable_data = {
-                    "Company Name": "-",
-                    "domain": domain,
-                    "employees": "-",
-                    "employees_prooflink": "-",
-                    "subindustry": "-",
-                    "industry": "-",
-                    "revenue": "-",
-                    "revenue_prooflink": "-",
-                    "first_name": "-",
-                    "last_name": "-",
-                    "title": "-",
-                    "prooflink": "-",
-                    "location": "-",
-                    "status": "bad domain",
-                    "email": "-",
-                    "email_status": "-",
-                    "last_activity": "-"
-                }
-
-                unsuitable_results.append(unsuitable_data)
-                write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data) 
-
-                # continue   
-
-            else:      
-
-                clean_domain = get_clean_domain(domain)
+        run = {
+            "db": db,
+            "entry": entry,
+            "entry_id": entry_id,
+            "data": data,
+            "sheet": sheet,
+            "suitable_results": suitable_results,
+            "unsuitable_results": unsuitable_results,
+            "exclude_keywords": exclude_keywords,
+            "is_company_geo_required": is_company_geo_required,
+            "domains_and_countries": domains_and_countries,
+            "sup_emails": sup_emails,
+            "lpc": data.get("lpc") or 1,
+            "goal": data.get("goal") or 1,
+            "token": token,
+            "checkpoints": checkpoints,
+        }
+
+        # Searches submitted but not processed yet; they are polled in the background
+        # while the next companies are enriched
+        pending_searches = deque()
+        is_stopped = False
+        idx = 0
+
+        # Leases are renewed while this run holds items, so they are only taken over if it dies
+        heartbeat.start()
+
+        def enrichment_jobs():
+            while not goal_reached(run):
+                claimed = claim_items(db, entry_id, worker_id)
+                if not claimed:
+                    return
+
+                # Items checkpointed by an earlier run (or a worker that died): enriched /
+                # searched companies go straight to the next search
+                restored_companies = {}
+                restored_request_ids = {}
+                new_values = []
+                for value, (status, result) in claimed.items():
+                    checkpoints.restore(value, result)
+                    if status in ("enriched", "searching") and result.get("company"):
+                        restored_companies[value] = result["company"]
+                        if status == "searching":
+                            restored_request_ids[value] = result.get("request_id")
+                    else:
+                        new_values.append(value)
+
+                if restored_companies:
+                    print(f"♻️ Resuming {len(restored_companies)} enriched companies")
+
+                # Searches that run was waiting for are waited for again rather than re-submitted
+                if restored_request_ids:
+                    request_ids = {str(request_id) for request_id in restored_request_ids.values()}
+                    for pending in get_pending_searches(db, entry_id):
+                        if pending["request_id"] in request_ids:
+                            job = reattach_search(run, pending, restored_companies, restored_request_ids)
+                            if job:
+                                pending_searches.append(job)
+
+                for value, company in restored_companies.items():
+                    yield {"value": value, "clean_domain": company["domain"], "company": company}, None
+
+                for domain in random.sample(new_values, len(new_values)):
+                    job = prepare_domain(run, domain, sup_domains)
+                    if job:
+                        yield job
+                    else:
+                        checkpoints.mark(domain, "processed")
 
-                # Check if domain in sup list
-                if sup_domains and clean_domain in sup_domains:
-                        print(f"The domain ('{clean_domain}') in sup list.")
-                        
-                        unsuitable_data = {
-                            "Company Name": "-",
-                            "domain": clean_domain,
-                            "employees": "-",
-                            "employees_prooflink": "-",
-                            "subindustry": "-",
-                            "industry": "-",
-                            "revenue": "-",
-                            "revenue_prooflink": "-",
-                            "first_name": "-",
-                            "last_name": "-",
-                            "title": "-",
-                            "prooflink": "-",
-                            "location": "-",
-                            "status": "sup domain",
-                            "email": "-",
-                            "email_status": "-",
-                            "last_activity": "-"
-                        }
+        # Company and revenue lookups of the next domains are in flight while one is filtered
+        enriched = EnrichmentStage(token=token).run(enrichment_jobs())
 
-                        unsuitable_results.append(unsuitable_data)
-                        write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data) 
+        # /stop cancels the token; every wait below gives up with Cancelled within CANCEL_POLL_SECONDS
+        try:
+            for idx, (lookup, fetched) in enumerate(enriched, start=1):
+                token.raise_if_cancelled()
 
-                        # continue                   
+                print(f"\n⏳ Processing company {idx} \n")
+                print(f"Domain:: {lookup['clean_domain']}")
 
+                if "company" in lookup:
+                    company_info = dict(lookup["company"])
                 else:
-
-                    company_data = get_company_by_domain(API_KEY, clean_domain)
-
-                    if company_data == "No more credits for domain API":
-                        entry.status = "Failed"
-                        entry.error_message = "No more credits"
-                        db.commit()
-                        db.refresh(entry)
-
-                        raise Exception("No more credits")
-
-                    if company_data == "Subscription is suspended":
-                        entry.status = "Failed"
-                        entry.error_message = "Subscription is suspended. Contact admin for renewal"
-                        db.commit()
-                        db.refresh(entry)
-
-                        raise Exception("Subscription is suspended. Contact admin for renewal")
-
-                    if not company_data:
-
-                        print(f"No results for domain '{clean_domain}', simplifying domain and retrying...")
-                        simplified_domain = ".".join(clean_domain.split(".")[-2:])
-                        print(f"Retrying with simplified domain: {simplified_domain}")
-                        company_data = get_company_by_domain(API_KEY, simplified_domain)
-                                
-                    if not company_data:
-
-                        print(f"The API was not able to find the domain on Linkedin ('{clean_domain}').You will not be charged for this request.")
-                        
-                        unsuitable_data = {
-                            "Company Name": "-",
-                            "domain": clean_domain,
-                            "employees": "-",
-                            "employees_prooflink": "-",
-                            "subindustry": "-",
-                            "industry": "-",
-                            "revenue": "-",
-                            "revenue_prooflink": "-",
-                            "first_name": "-",
-                            "last_name": "-",
-                            "title": "-",
-                            "prooflink": "-",
-                            "location": "-",
-                            "status": "domain not found in linkedin",
-                            "email": "-",
-                            "email_status": "-",
-                            "last_activity": "-"
-                        }
-
-                        unsuitable_results.append(unsuitable_data)
-                        write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data) 
-
-                        # continue       
-
-                    else:            
-                                    
-                        company_name = company_data.get('company_name', 'no info')
-                        employee_range = company_data.get('employee_range', 'no info')
-                        employee_count = company_data.get('employee_count', 'no info')
-                        employees_prooflink = company_data.get('linkedin_url', 'no info')
-                        company_id = company_data.get('company_id', 'no info')
-
-                        # Check if company name in sup list
-                        if sup_names:
-                            lower_list = [item.lower() for item in sup_names]
-                            lower_name = company_name.lower()
-                            if lower_name in lower_list:
-                                print(f"The company ('{company_name}') in sup list.")
-                                
-                                unsuitable_data = {
-                                    "Company Name": company_name,
-                                    "domain": clean_domain,
-                                    "employees": employee_range,
-                                    "employees_prooflink": employees_prooflink,
-                                    "subindustry": "",
-                                    "industry": "",
-                                    "revenue": "",
-                                    "revenue_prooflink": "",
-                                    "first_name": "-",
-                                    "last_name": "-",
-                                    "title": "-",
-                                    "prooflink": "-",
-                                    "location": "-",
-                                    "status": "sup name",
-                                    "email": "-",
-                                    "email_status": "-",
-                                    "last_activity": "-"
-                                }
-
-                                unsuitable_results.append(unsuitable_data)
-                                write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data) 
-
-                                continue    
-                        
-                        if len(company_data.get('industries', ['no info'])) > 0:
-                            subindustry = company_data.get('industries', ['no info'])[0]
-                            industries = find_matching_industry(subindustry) if subindustry != 'no info' else 'no info'
-                        else:
-                            subindustry = None
-                            industries = None
-
-                        revenue_data = get_revenue(clean_domain)
-
-                        if revenue_data:
-                            revenue = revenue_data[0]
-                            revenue_prooflink = revenue_data[1]
-                        else:
-                            revenue = None
-                            revenue_prooflink = None
-
-                        print(f"✅ Done Step 2 (Get company revenue: '/search')")
-
-                        if isinstance(data, str):
-                            data = json.loads(data) 
-
-                        lpc = data["lpc"]
-                        goal = data["goal"]
-                        input_size = data["size"]
-                        input_industry = data["industry"]
-                        input_revenue = data["revenue"]
-
-                        input_data = {
-                            "input_industry": input_industry,
-                            "input_size": input_size,
-                            "input_revenue": input_revenue,
-                        }
-
-                        if not revenue:
-                            revenue = "-"
-                            revenue_prooflink = "-"
-
-                        if not subindustry:
-                            subindustry = "-"
-                            industries = "-"
-
-                        if not employee_count or employee_count == 0 or employee_count == "0":
-                            employee_range = "-"
-
-                        scraped_company_data = {
-                            "industry": industries,
-                            "employees": employee_range,
-                            "revenue": revenue,
-                        }
-
-                        compared_data_info = compare_data(input_data, scraped_company_data)
-
-                        if not compared_data_info["is_valid"]:
-                            unsuitable_data = {
-                                "Company Name": company_name,
-                                "domain": clean_domain,
-                                "employees": employee_range,
-                                "employees_prooflink": employees_prooflink,
-                                "subindustry": subindustry,
-                                "industry": industries,
-                                "revenue": revenue,
-                                "revenue_prooflink": revenue_prooflink,
-                                "first_name": "-",
-                                "last_name": "-",
-                                "title": "-",
-                                "prooflink": "-",
-                                "location": "-",
-                                "status": compared_data_info["status"],
-                                "email": "-",
-                                "email_status": "-",
-                                "last_activity": "-"
-                            }
-
-                            unsuitable_results.append(unsuitable_data)
-                            write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
-                            
-                            # continue
-
-                        else:
-
-                            # Define geo codes
-                            selected_countries = data.get("geo")
-                            if "select_all_countries" in selected_countries:
-                                geolocations = list(country_ids.keys())
-                            else:
-                                geolocations = selected_countries
-                            
-                            geo_codes = [country_ids[country] for country in geolocations][:20]
-
-                            first_requirements = data.get("requirements")[0]
-
-                            # Define keywords ***********************
-                            modifed_keywords = first_requirements.get("keywords", "").replace("keywords", "").replace("/", ",").replace(":", "")
-                            cleaned_keywords = [x.strip() for x in modifed_keywords.split(",") if x.strip()]
-                            keywords = []
-                            for i in cleaned_keywords:
-                                keywords.append(i)
-
-                            # Define functions **********************
-                            job_functions = first_requirements.get("job_function")
-                            if job_functions == ['any']:
-                                job_functions = []
-
-                            job_functions = ["Operations" if item == "Business operations" else item for item in job_functions]
-
-                            # Define levels **************************
-                            level1 = first_requirements.get("level1", [])
-                            level2 = first_requirements.get("level2", [])
-                            level3 = first_requirements.get("level3", [])
-                            levels = get_job_levels(level1, level2, level3)
-
-                            # Compare keywords and titles 
-                            # if keywords:
-                            #     compared_keywords = any(item.lower() in (x.lower() for x in keywords) for item in levels)
-                            #     is_exist_keywords = compared_keywords
-                            # else:
-                            #     is_exist_keywords = True
-
-                            # if not is_exist_keywords:
-                            #     unsuitable_data = {
-                            #         "Company Name": company_name,
-                            #         "domain": clean_domain,
-                            #         "employees": employee_range,
-                            #         "employees_prooflink": employees_prooflink,
-                            #         "subindustry": subindustry,
-                            #         "industry": industries,
-                            #         "revenue": revenue,
-                            #         "revenue_prooflink": revenue_prooflink,
-                            #         "first_name": "-",
-                            #         "last_name": "-",
-                            #         "title": "-",
-                            #         "prooflink": "-",
-                            #         "location": "-",
-                            #         "status": "h title",
-                            #         "email": "-",
-                            #         "email_status": "-",
-                            #         "last_activity": "-"
-                            #     }
-
-                            #     unsuitable_results.append(unsuitable_data)
-                            #     write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
-
-                            # else:
-
-                            print(f"✅ Done Step 3 (Compare company data with user input)")
-
-                            # Store company data for chunk processing
-                            chunk.append(company_id)
-                            company_data_map[company_id] = {
-                                'company_name': company_name,
-                                'domain': clean_domain,
-                                'employee_range': employee_range,
-                                'employees_prooflink': employees_prooflink,
-                                'subindustry': subindustry,
-                                'industry': industries,
-                                'revenue': revenue,
-                                'revenue_prooflink': revenue_prooflink,
-                                'company_data': company_data
-                            }
-
-                            # Store in global cache for frontend access
-                            store_processed_data(entry_id, {
-                                "job_levels": levels,
-                                "job_functions": job_functions,
-                                "keywords": keywords,
-                                "geo_locations": geolocations,
-                                "entry_name": entry.name 
-                            })
-
-                            # print(f"✅ Data stored in cache for entry: {entry_id}") # ********* for display in UI
-
-            # Process chunk when full or at the end
-            if chunk:
-                if len(chunk) == 10 or idx == len(values_to_process):
-                    
-                    data_request = {
-                        "current_company_ids": chunk,
-                        "title_keywords": keywords[:20],
-                        "functions": job_functions, 
-                        "geo_codes": geo_codes,
-                        "geo_codes_exclude": [],
-                        "title_keywords_exclude": exclude_keywords,
-                        "past_company_ids": [],
-                        "keywords": [],
-                        "limit": len(chunk) * 2 * int(lpc)
-                    }
-
-                    print(f"\n{data_request}\n")
-
-                    # Step 4 - Search leads
-                    request_id = search_leads(API_KEY, data_request)
-
-                    if not request_id:
-                        print("❌ No request_id returned.")
-                        # Mark all companies in chunk as failed
-                        for comp_id in chunk:
-                            comp_data = company_data_map[comp_id]
-                            unsuitable_data = {
-                                "Company Name": comp_data['company_name'],
-                                "domain": comp_data['domain'],
-                                "employees": comp_data['employee_range'],
-                                "employees_prooflink": comp_data['employees_prooflink'],
-                                "subindustry": comp_data['subindustry'],
-                                "industry": comp_data['industry'],
-                                "revenue": comp_data['revenue'],
-                                "revenue_prooflink": comp_data['revenue_prooflink'],
-                                "first_name": "-",
-                                "last_name": "-",
-                                "title": "-",
-                                "prooflink": "-",
-                                "location": "-",
-                                "status": "search failed",
-                                "email": "-",
-                                "email_status": "-",
-                                "last_activity": "-"
-                            }
-                            unsuitable_results.append(unsuitable_data)
-                            write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
-                        chunk = []
-                        company_data_map = {}
-
-                        continue
-
-                    # Wait for results
-                    check_search_data = wait_for_results(API_KEY, request_id, delay=20, max_retries=25)
-
-                    if check_search_data["status"] != "done":
-                        print("❌ Timed out waiting for result.")
-                        # Mark all companies in chunk as failed
-                        for comp_id in chunk:
-                            comp_data = company_data_map[comp_id]
-                            unsuitable_data = {
-                                "Company Name": comp_data['company_name'],
-                                "domain": comp_data['domain'],
-                                "employees": comp_data['employee_range'],
-                                "employees_prooflink": comp_data['employees_prooflink'],
-                                "subindustry": comp_data['subindustry'],
-                                "industry": comp_data['industry'],
-                                "revenue": comp_data['revenue'],
-                                "revenue_prooflink": comp_data['revenue_prooflink'],
-                                "first_name": "-",
-                                "last_name": "-",
-                                "title": "-",
-                                "prooflink": "-",
-                                "location": "-",
-                                "status": "search timeout",
-                                "email": "-",
-                                "email_status": "-",
-                                "last_activity": "-"
-                            }
-                            unsuitable_results.append(unsuitable_data)
-                            write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
-                        chunk = []
-                        company_data_map = {}
-
-                        continue
-                    
-                    lead_count = check_search_data.get("total_count", 0)
-
-                    print(f"Lead count = {lead_count}")
-
-                    if lead_count:
-                        last_count = lead_count if lead_count > 0 else 0
+                    company_info = enrich_domain(run, lookup, fetched, sup_names)
+                    if company_info:
+                        checkpoints.mark(lookup["value"], "enriched", company={k: v for k, v in company_info.items() if k != "company_data"})
                     else:
-                        lead_count = 0
-                        last_count = 0
-                    
-                    if lead_count == 0:
-                        
-                        # ///////////////////////////////////////////////////////////////////////////////////////////////////
-                        # //////////////////////// Try search again if there are other requirements /////////////////////////
-                        # ///////////////////////////////////////////////////////////////////////////////////////////////////
-                        
-                        if requirements_count > 1:
-
-                            left_requirements = data.get("requirements")[1:]
-
-                            for req_idx in range(len(left_requirements)):
-
-                                # Define keywords ***********************
-                                modifed_keywords = left_requirements[req_idx].get("keywords", "").replace("keywords", "").replace("/", ",").replace(":", "")                                
-                                cleaned_keywords = [x.strip() for x in modifed_keywords.split(",") if x.strip()]
-                                keywords = []
-                                for i in cleaned_keywords:
-                                    keywords.append(i)
-
-                                # Define functions **********************
-                                job_functions = left_requirements[req_idx].get("job_function")
-                                if job_functions == ['any']:
-                                    job_functions = []
-
-                                job_functions = ["Operations" if item == "Business operations" else item for item in job_functions]
-
-                                # Define levels **************************
-                                level1 = left_requirements[req_idx].get("level1", [])
-                                level2 = left_requirements[req_idx].get("level2", [])
-                                level3 = left_requirements[req_idx].get("level3", [])
-                                levels = get_job_levels(level1, level2, level3)
-
-                                # Store in global cache for frontend access
-                                store_processed_data(entry_id, {
-                                    "job_levels": levels,
-                                    "job_functions": job_functions,
-                                    "keywords": keywords,
-                                    "geo_locations": geolocations,
-                                    "entry_name": entry.name 
-                                })
-
-                                data_request = {
-                                    "current_company_ids": chunk,
-                                    "title_keywords": keywords[:20],
-                                    "functions": job_functions, 
-                                    "geo_codes": geo_codes,
-                                    "geo_codes_exclude": [],
-                                    "title_keywords_exclude": exclude_keywords,
-                                    "past_company_ids": [],
-                                    "keywords": [],
-                                    "limit": len(chunk) * 2 * int(lpc)
-                                }
-
-                                print(f"\n{data_request}\n")
-
-                                # Search leads
-                                request_id = search_leads(API_KEY, data_request)
-
-                                if not request_id:
-                                    print("❌ No request_id returned.")
-                                    # Mark all companies in chunk as failed
-                                    for comp_id in chunk:
-                                        comp_data = company_data_map[comp_id]
-                                        unsuitable_data = {
-                                            "Company Name": comp_data['company_name'],
-                                            "domain": comp_data['domain'],
-                                            "employees": comp_data['employee_range'],
-                                            "employees_prooflink": comp_data['employees_prooflink'],
-                                            "subindustry": comp_data['subindustry'],
-                                            "industry": comp_data['industry'],
-                                            "revenue": comp_data['revenue'],
-                                            "revenue_prooflink": comp_data['revenue_prooflink'],
-                                            "first_name": "-",
-                                            "last_name": "-",
-                                            "title": "-",
-                                            "prooflink": "-",
-                                            "location": "-",
-                                            "status": "search failed",
-                                            "email": "-",
-                                            "email_status": "-",
-                                            "last_activity": "-"
-                                        }
-                                        unsuitable_results.append(unsuitable_data)
-                                        write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
-                                    chunk = []
-                                    company_data_map = {}
-                                    
-                                    continue
-
-                                # Wait for results ////////////////////////////////////////////////////////////////////////////
-                                check_search_data = wait_for_results(API_KEY, request_id, delay=20, max_retries=25)
-
-                                if check_search_data["status"] != "done":
-                                    print("❌ Timed out waiting for result.")
-                                    # Mark all companies in chunk as failed
-                                    for comp_id in chunk:
-                                        comp_data = company_data_map[comp_id]
-                                        unsuitable_data = {
-                                            "Company Name": comp_data['company_name'],
-                                            "domain": comp_data['domain'],
-                                            "employees": comp_data['employee_range'],
-                                            "employees_prooflink": comp_data['employees_prooflink'],
-                                            "subindustry": comp_data['subindustry'],
-                                            "industry": comp_data['industry'],
-                                            "revenue": comp_data['revenue'],
-                                            "revenue_prooflink": comp_data['revenue_prooflink'],
-                                            "first_name": "-",
-                                            "last_name": "-",
-                                            "title": "-",
-                                            "prooflink": "-",
-                                            "location": "-",
-                                            "status": "search timeout",
-                                            "email": "-",
-                                            "email_status": "-",
-                                            "last_activity": "-"
-                                        }
-                                        unsuitable_results.append(unsuitable_data)
-                                        write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
-                                    chunk = []
-                                    company_data_map = {}
-                                    continue
-                                
-                                lead_count = check_search_data.get("total_count", 0)
-
-                                print(f"Lead count = {lead_count}")
-
-                                if lead_count > 0: 
-                                    last_count = lead_count
-                                    break
-
-                        else:
-                            # ////////////////////////////// End of search when lead count still 0 //////////////////////////////
-
-                            for comp_id in chunk:
-                                comp_data = company_data_map[comp_id]
-                                unsuitable_data = {
-                                    "Company Name": comp_data['company_name'],
-                                    "domain": comp_data['domain'],
-                                    "employees": comp_data['employee_range'],
-                                    "employees_prooflink": comp_data['employees_prooflink'],
-                                    "subindustry": comp_data['subindustry'],
-                                    "industry": comp_data['industry'],
-                                    "revenue": comp_data['revenue'],
-                                    "revenue_prooflink": comp_data['revenue_prooflink'],
-                                    "first_name": "-",
-                                    "last_name": "-",
-                                    "title": "-",
-                                    "prooflink": "-",
-                                    "location": "-",
-                                    "status": "no leads",
-                                    "email": "-",
-                                    "email_status": "-",
-                                    "last_activity": "-"
-                                }
-                                unsuitable_results.append(unsuitable_data)
-                                write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
-                
-
-                    print(f"=============================== {last_count} =========================================")
-                    if last_count > 0:
-                        leads_data = get_search_results(API_KEY, request_id)
-                        print(f"✅ Done Step 5 (Get search results: 'search-results/')")
-                        
-                        # Process leads for each company in the chunk
-                        for comp_id in chunk:
-                            comp_data = company_data_map[comp_id]
-                            
-                            # Filter leads for this specific company
-                            company_leads = [lead for lead in leads_data.get("data", []) 
-                                        if lead.get("company_id") == comp_id]
-                            
-                            if not company_leads:
-                                # No leads for this specific company
-                                unsuitable_data = {
-                                    "Company Name": comp_data['company_name'],
-                                    "domain": comp_data['domain'],
-                                    "employees": comp_data['employee_range'],
-                                    "employees_prooflink": comp_data['employees_prooflink'],
-                                    "subindustry": comp_data['subindustry'],
-                                    "industry": comp_data['industry'],
-                                    "revenue": comp_data['revenue'],
-                                    "revenue_prooflink": comp_data['revenue_prooflink'],
-                                    "first_name": "-",
-                                    "last_name": "-",
-                                    "title": "-",
-                                    "prooflink": "-",
-                                    "location": "-",
-                                    "status": "no leads",
-                                    "email": "-",
-                                    "email_status": "-",
-                                    "last_activity": "-"
-                                }
-                                unsuitable_results.append(unsuitable_data)
-                                write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
-                                continue
-                            
-                            # Process leads for this company
-                            temp_lead_valid_count = 0
-                            leads = []
+                        checkpoints.mark(lookup["value"], "processed")
 
-                            print(f"✅ Done Step 7 (Store leads data for find 'lpc' in next steps)")
-                            
-                            for lead in company_leads:
-                                first_name = lead.get("first_name", "-")
-                                last_name = lead.get("last_name", "-")
-                                title = lead.get("job_title", "-")
-                                linkedin_url = lead.get("linkedin_url", "-")
-                                location = lead.get("location", "-")
-
-                                # Check lead title 
-                                title_states = []
-                                is_valid_title = check_lead_title(title, levels)
-
-                                # Translate title if need
-                                if not is_valid_title:
-                                    try:
-                                        try_to_translate_title = translate_title(title)
-
-                                        if try_to_translate_title:
-                                            title = try_to_translate_title
-                                            is_valid_title = check_lead_title(title, levels)
-                                            print(f"TITLE AFTER :: {title}")
-                                    except:
-                                        pass
-
-                                title_states.append(is_valid_title)
-                                                                    
-                                # Compare keywords and titles 
-                                if keywords:
-
-                                    lowercase_list_of_keywords = [item.lower() for item in keywords]
-
-                                    compared_keywords = any(word.lower() in title.lower().split() for word in lowercase_list_of_keywords)
-                                    is_valid_keyword = compared_keywords
-                                    
-                                    title_states.append(is_valid_keyword)
-
-                                if False in title_states:
-                                    unsuitable_data = {
-                                        "Company Name": comp_data['company_name'],
-                                        "domain": comp_data['domain'],
-                                        "employees": comp_data['employee_range'],
-                                        "employees_prooflink": comp_data['employees_prooflink'],
-                                        "subindustry": comp_data['subindustry'],
-                                        "industry": comp_data['industry'],
-                                        "revenue": comp_data['revenue'],
-                                        "revenue_prooflink": comp_data['revenue_prooflink'],
-                                        "first_name": first_name,
-                                        "last_name": last_name,
-                                        "title": title,
-                                        "prooflink": linkedin_url,
-                                        "location": location,
-                                        "status": "h title",
-                                        "email": "-",
-                                        "email_status": "-",
-                                        "last_activity": "-"
-                                    }
-
-                                    unsuitable_results.append(unsuitable_data)
-                                    write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
-                                    
-                                    continue
-
-                                # Check lead geo if required
-                                if is_company_geo_required:
-                                    if domains_and_countries[comp_data['domain']].lower() not in location.lower():
-                                        unsuitable_data = {
-                                            "Company Name": comp_data['company_name'],
-                                            "domain": comp_data['domain'],
-                                            "employees": comp_data['employee_range'],
-                                            "employees_prooflink": comp_data['employees_prooflink'],
-                                            "subindustry": comp_data['subindustry'],
-                                            "industry": comp_data['industry'],
-                                            "revenue": comp_data['revenue'],
-                                            "revenue_prooflink": comp_data['revenue_prooflink'],
-                                            "first_name": first_name,
-                                            "last_name": last_name,
-                                            "title": title,
-                                            "prooflink": linkedin_url,
-                                            "location": location,
-                                            "status": "h geo",
-                                            "email": "-",
-                                            "email_status": "-",
-                                            "last_activity": "-"
-                                        }
-                                        unsuitable_results.append(unsuitable_data)
-                                        write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
-                                        continue
-                                
-                                # Defer activity check until after email validation
-                                last_activity = "-"
+                if company_info:
+                    # Store company data for chunk processing
+                    company_id = company_info.pop('company_id')
+                    company_info['item_value'] = lookup["value"]
+                    chunk.append(company_id)
+                    company_data_map[company_id] = company_info
 
-                                person_data = {
-                                    "first_name": first_name,
-                                    "last_name": last_name,
-                                    "domain": comp_data['domain'],
-                                    "linkedin_url": linkedin_url,
-                                    "location": location,
-                                    "title": title,
-                                    "last_activity": last_activity
-                                }
-
-                                leads.append(person_data)
-                            
-                            # Store leads data temporarily
-                            with open("leads_data.json", "w", encoding="utf-8") as f:
-                                json.dump(leads, f, indent=4)
-                            
-                            # Read and process leads
-                            with open("leads_data.json", "r", encoding="utf-8") as f:
-                                people_list = json.load(f)
-                            
-                            for person in people_list:
-                                person_data_for_call = {
-                                    "first_name": person["first_name"],
-                                    "last_name": person["last_name"],
-                                    "domain": person["domain"],
-                                }
- 
-                                if "?" in person["first_name"] or "?" in person["last_name"]:
-                                    unsuitable_data = { 
-                                        "Company Name": comp_data['company_name'], 
-                                        "domain": comp_data['domain'], 
-                                        "employees": comp_data['employee_range'], 
-                                        "employees_prooflink": comp_data['employees_prooflink'], 
-                                        "subindustry": comp_data['subindustry'], 
-                                        "industry": comp_data['industry'], 
-                                        "revenue": comp_data['revenue'], 
-                                        "revenue_prooflink": comp_data['revenue_prooflink'], 
-                                        "first_name": person["first_name"], 
-                                        "last_name": person["last_name"], 
-                                        "title": title, 
-                                        "prooflink": linkedin_url, 
-                                        "location": location, 
-                                        "status": "", 
-                                        "email": "-", 
-                                        "email_status": "email not found", 
-                                        "last_activity": "-", 
-                                    } 
-                                    unsuitable_results.append(unsuitable_data) 
-                                    write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data) 
-                                    
-                                    continue 
-                                
-                                # ///////////////////////////////////////////////////////////////////////////////////////////////////
-                                # ///////////////////////////////// EMAIL FIND STEP /////////////////////////////////////////////////
-                                # ///////////////////////////////////////////////////////////////////////////////////////////////////
-                                
-                                find_email_response = find_email(person_data_for_call)
-
-                                # Recall api with simplified domain
-                                # if not find_email_response or find_email_response.get("address") == "email not found":
-                                #     simplified_domain = ".".join(person["domain"].split(".")[-2:])
-                                #     person_data_for_call["domain"] = simplified_domain
-
-                                #     find_email_response = find_email(person_data_for_call)
-
-                                # Step 1: Retry with simplified domain
-                                if not find_email_response or find_email_response.get("address") == "email not found":
-                                    print(f"!!!!!!!!!!!!!!!!!! ALTERNATIVE 111111111111")
-                                    simplified_domain = ".".join(person["domain"].split(".")[-2:])
-                                    person_data_for_call["domain"] = simplified_domain
-                                    find_email_response = find_email(person_data_for_call)
-
-                                # Step 2: Try guessed patterns
-                                if not find_email_response or find_email_response.get("address") == "email not found":
-                                    print(f"!!!!!!!!!!!!!!!!!! ALTERNATIVE 2222222222222")
-                                    first_name = person_data_for_call.get("first_name", "").lower()
-                                    last_name = person_data_for_call.get("last_name", "").lower()
-                                    domain = person_data_for_call.get("domain", "").lower()
-
-                                    if first_name and last_name and domain:
-                                        fi = first_name[0]
-                                        patterns = [
-                                            f"{first_name}.{last_name}@{domain}",
-                                            f"{fi}.{last_name}@{domain}",
-                                            f"{fi}{last_name}@{domain}",
-                                        ]
-
-                                        guessed_response = None
-                                        for email_guess in patterns:
-                                            test_data = person_data_for_call.copy()
-                                            test_data["email_guess"] = email_guess
-                                            guessed_response = find_email(test_data)
-
-                                            if guessed_response and guessed_response.get("address") != "email not found":
-                                                find_email_response = guessed_response
-                                                break
-                                        else:
-                                            find_email_response = guessed_response or {"address": "email not found"}
-
-                                email_find_variant = ""
-
-                                if not find_email_response:
-                                    email = "email not found"
-                                    email_find_variant = "find-one/"
-                                    email_status = ""
-
-                                else:
-                                    email = find_email_response.get("address", "email not found")
-                                    email_find_variant = "find-one/"
-                                    email_status = ""
-
-                                print(f"✅ Done Step 8 (Find lead email: {email_find_variant})")
-
-                                if email != "email not found":
-
-                                    if email_find_variant == "find-one/":
-                                        verify_email_response = verify_email(API_KEY_VERIFY, email)
-
-                                        email_status = verify_email_response["status"]
-
-                                        print(f"~~~~~~~~~ {email} ----- {email_status}")
-
-                                        if email_status == "valid" or email_status == "accept_all":
-                                            is_valid_email = True
-                                        else:
-                                            is_valid_email = False
-                                        
-                                    print(f"✅ Done Step 9 (Verify lead email: {email_find_variant})")
-
-                                    if is_valid_email:
-
-                                        # Check email in sub list
-                                        if sup_emails:
-                                            print(f"✅ Done Step 10 (Check email in sup list)")
-                                            if email in sup_emails:
-                                                email_status = "sup"
-                                            else:
-                                                email_status = email_status
-                                        else:
-                                            email_status = email_status
-
-                                    else:
-                                        email_status = email_status
-                                else:
-                                    email = "-"
-                                    email_status = "email not found"
-                                
-                                scraped_data = {
-                                    "Company Name": comp_data['company_name'],
-                                    "domain": comp_data['domain'],
-                                    "employees": comp_data['employee_range'],
-                                    "employees_prooflink": comp_data['employees_prooflink'],
-                                    "subindustry": comp_data['subindustry'],
-                                    "industry": comp_data['industry'],
-                                    "revenue": comp_data['revenue'],
-                                    "revenue_prooflink": comp_data['revenue_prooflink'],
-                                    "first_name": person["first_name"],
-                                    "last_name": person["last_name"], 
-                                    "title": person["title"],
-                                    "prooflink": person["linkedin_url"],
-                                    "location": person["location"],
-                                    "status": "",
-                                    "email": email,
-                                    "email_status": email_status,
-                                    "last_activity": "-",
-                                }
-
-                                if email_status == "valid" or email_status == "accept_all":
-                                    # Now that we have a valid email, check lead activity
-                                    computed_last_activity = "-"
-                                    if person["linkedin_url"] and person["linkedin_url"] != "-":
-                                        profile_activity = get_profile_activity(person["linkedin_url"])
-
-                                        if profile_activity == "No more credits for domain API" or profile_activity == "Subscription is suspended":
-                                            entry.status = "Failed"
-                                            entry.error_message = "Subscription is suspended. Contact admin for renewal"
-                                            db.commit()
-                                            db.refresh(entry)
-                                            raise Exception("Subscription is suspended. Contact admin for renewal")
-
-                                        computed_last_activity = profile_activity.get("recent_activity_time", "-")
-
-                                    # If activity indicates years-old, mark as unsuitable due to activity
-                                    if computed_last_activity and "yr" in computed_last_activity.lower():
-                                        unsuitable_data = {
-                                            "Company Name": comp_data['company_name'],
-                                            "domain": comp_data['domain'],
-                                            "employees": comp_data['employee_range'],
-                                            "employees_prooflink": comp_data['employees_prooflink'],
-                                            "subindustry": comp_data['subindustry'],
-                                            "industry": comp_data['industry'],
-                                            "revenue": comp_data['revenue'],
-                                            "revenue_prooflink": comp_data['revenue_prooflink'],
-                                            "first_name": person["first_name"],
-                                            "last_name": person["last_name"],
-                                            "title": person["title"],
-                                            "prooflink": person["linkedin_url"],
-                                            "location": person["location"],
-                                            "status": "activity",
-                                            "email": email,
-                                            "email_status": email_status,
-                                            "last_activity": computed_last_activity,
-                                        }
-                                        unsuitable_results.append(unsuitable_data)
-                                        write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", unsuitable_data)
-                                    else:
-                                        # Otherwise proceed as suitable with activity info
-                                        scraped_data["last_activity"] = computed_last_activity
-                                        suitable_results.append(scraped_data)
-                                        temp_lead_valid_count += 1
-                                        write_results_in_tab(sheet, suitable_results, unsuitable_results, "suitable", scraped_data)
-                                else:
-                                    scraped_data["last_activity"] = "-"
-                                    unsuitable_results.append(scraped_data)
-                                    write_results_in_tab(sheet, suitable_results, unsuitable_results, "unsuitable", scraped_data)
-
-                                # Check LPC limit
-                                if temp_lead_valid_count == int(lpc):
-                                    break
-                            
-                            # Check overall goal
-                            if len(suitable_results) >= int(goal):
-                                entry.status = "Done"
-                                db.commit()
-                                break
+                # Submit the search when the chunk is full
+                if len(chunk) == 10:
+                    job = submit_chunk_search(run, chunk, company_data_map)
+                    if job:
+                        pending_searches.append(job)
 
                     # Reset for next chunk
                     chunk = []
                     company_data_map = {}
-                    
-                    # Check if we reached the goal after processing chunk
-                    if len(suitable_results) >= int(goal):
+
+                # Process searches that are done, or the oldest one when too many are in flight
+                while pending_searches and (pending_searches[0]["future"].done() or len(pending_searches) > SEARCH_PIPELINE_DEPTH):
+                    finish_chunk_search(run, pending_searches.popleft())
+
+                    if goal_reached(run):
                         break
 
-        flush_all_buffers(sheet)
+                # Check if we reached the goal after processing chunk
+                if goal_reached(run):
+                    break
 
-        all_processed = suitable_results + unsuitable_results
-        unique_processed_values = list(set(d["domain"] for d in all_processed))
+            enriched.close()
 
-        print(f"++++++++ {unique_processed_values}")
-        print(f"-------- {entry_id}")
+            # Last (partial) chunk, then whatever is still in flight
+            if not goal_reached(run):
+                if chunk:
+                    job = submit_chunk_search(run, chunk, company_data_map)
+                    if job:
+                        pending_searches.append(job)
 
-        items = db.query(ProcessItem)\
-            .filter(ProcessItem.entry_id == entry_id,
-                    ProcessItem.value.in_(unique_processed_values))\
-            .all()
+                while pending_searches and not goal_reached(run):
+                    finish_chunk_search(run, pending_searches.popleft())
 
-        for item in items:
-            item.status = "processed"
+        except Cancelled:
+            print(f"⏹️ Stopped at row {idx}")
+            entry.last_processed_row = idx
+            db.commit()
 
-        db.commit()
+            is_stopped = True
+            enriched.close()
 
-        # Final status update
-        if not entry.is_stopped:
-            entry.status = "Done"
-            entry.error_message = ""
+        # Searches not needed anymore (stopped or goal reached)
+        for job in pending_searches:
+            job["future"].cancel()
+            api_calls_async.forget_search_key(job["request_id"])
+
+        # Sheet rows first, then the checkpoints of the items they belong to
+        checkpoints.flush()
+        flush_all_buffers(sheet)
+
+        # Final status update; while other workers still hold items of the entry, the last one sets it.
+        # Unleased unfinished items (e.g. given back by a worker that failed) keep it from being done,
+        # and a "Failed" / "Stopped" set by another worker is not overwritten
+        if goal_reached(run) or (
+            not has_leased_items(db, entry_id, exclude_owner=worker_id) and not has_claimable_items(db, entry_id)
+        ):
+            db.query(ProcessEntry)\
+                .filter(ProcessEntry.id == entry_id, ProcessEntry.status == "In Progress", ProcessEntry.is_stopped.isnot(True))\
+                .update({"status": "Done", "error_message": ""}, synchronize_session=False)
             db.commit()
 
     except Exception as e:
@@ -1521,10 +1702,22 @@ def process_entry_logic(entry_id: str):
         entry.error_message = str(e)
         db.commit()
 
+        # Keep the items finished before the error
+        if checkpoints is not None:
+            try:
+                checkpoints.flush()
+            except Exception as flush_error:
+                print(f"⚠️ Item checkpoints not saved: {flush_error}", flush=True)
+
         # Clean up cache on error
         delete_processed_data(entry_id)
         
     finally:
+        current_entry.reset(entry_scope)
+        heartbeat.stop()
+        release_item_leases(db, entry_id, worker_id)
+        release_cancellation_token(entry_id, token)
+        save_entry_metrics(db, entry_id)
         db.close()
 
         # Clean up cache when processing is complete
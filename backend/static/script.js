@@ -133,7 +133,7 @@
                 <button type="submit" class="resume-btn" title="Resume"><i class="fas fa-play"></i></button>
               </form>
             `;
-          } else if (entry.status === "In Progress") {
+          } else if (entry.status === "In Progress" || entry.status === "Queued") {
             controlButton = `
               <form method="post" action="/stop/${entry.id}" style="display:inline;">
                 <button type="submit" class="stop-btn" title="Stop"><i class="fas fa-pause"></i></button>
@@ -0,0 +1,135 @@
+import os
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import CompanyRecord, FailedDomainLookup
+from utils.utils import get_canonical_domain
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+COMPANY_STORE_TTL_DAYS = int(os.getenv("COMPANY_STORE_TTL_DAYS", "30"))
+REVENUE_STORE_TTL_DAYS = int(os.getenv("REVENUE_STORE_TTL_DAYS", "30"))
+# Shorter, since a company page may be created or fixed on Linkedin
+NOT_FOUND_STORE_TTL_DAYS = int(os.getenv("NOT_FOUND_STORE_TTL_DAYS", "3"))
+
+# Fields returned by get_company_by_domain that we keep
+COMPANY_FIELDS = ["company_name", "employee_range", "employee_count", "industries", "company_id", "linkedin_url"]
+
+
+def _is_fresh(fetched_at, ttl_days: int) -> bool:
+    return fetched_at is not None and datetime.utcnow() - fetched_at < timedelta(days=ttl_days)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_or_create(db, domain: str) -> CompanyRecord:
+    record = db.get(CompanyRecord, domain)
+    if record is None:
+        record = CompanyRecord(domain=domain)
+        db.add(record)
+    return record
+
+
+def _commit(db):
+    """
+    Commit a store write. Another entry may have inserted the same domain
+    at the same time; losing that race only costs the cache write.
+    """
+    try:
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"⚠️ Company store write skipped: {e}", flush=True)
+
+
+def get_cached_company(db, domain: str):
+    """
+    Return company data for a domain in the same shape as get_company_by_domain,
+    or None if it is not stored or older than COMPANY_STORE_TTL_DAYS.
+    """
+    record = db.get(CompanyRecord, get_canonical_domain(domain))
+    if record is None or not _is_fresh(record.company_fetched_at, COMPANY_STORE_TTL_DAYS):
+        return None
+
+    # Leave out missing fields so callers' .get(key, 'no info') defaults still apply
+    company_data = {}
+    for field in COMPANY_FIELDS:
+        value = getattr(record, field)
+        if value is not None:
+            company_data[field] = value
+
+    return company_data
+
+
+def save_company(db, domain: str, company_data: dict):
+    """
+    Store the company data returned by get_company_by_domain.
+    """
+    record = _get_or_create(db, get_canonical_domain(domain))
+    record.company_name = company_data.get("company_name")
+    record.employee_range = company_data.get("employee_range")
+    record.employee_count = _to_int(company_data.get("employee_count"))
+    record.industries = company_data.get("industries")
+    record.company_id = company_data.get("company_id")
+    record.linkedin_url = company_data.get("linkedin_url")
+    record.company_fetched_at = datetime.utcnow()
+    _commit(db)
+
+
+def get_cached_revenue(db, domain: str):
+    """
+    Return (is_cached, revenue_data) for a domain.
+    revenue_data has the same shape as get_revenue: (revenue, prooflink) or None.
+    """
+    record = db.get(CompanyRecord, get_canonical_domain(domain))
+    if record is None or not _is_fresh(record.revenue_fetched_at, REVENUE_STORE_TTL_DAYS):
+        return False, None
+
+    if record.revenue is None:
+        return True, None
+
+    return True, (record.revenue, record.revenue_prooflink)
+
+
+def save_revenue(db, domain: str, revenue_data):
+    """
+    Store the result of get_revenue, including "no revenue found".
+    """
+    record = _get_or_create(db, get_canonical_domain(domain))
+    if revenue_data:
+        record.revenue, record.revenue_prooflink = revenue_data[0], revenue_data[1]
+    else:
+        record.revenue, record.revenue_prooflink = None, None
+    record.revenue_fetched_at = datetime.utcnow()
+    _commit(db)
+
+
+def is_known_not_found(db, domain: str) -> bool:
+    """
+    True if the company API recently answered "not found" for this domain.
+    """
+    failure = db.get(FailedDomainLookup, get_canonical_domain(domain))
+    return failure is not None and _is_fresh(failure.failed_at, NOT_FOUND_STORE_TTL_DAYS)
+
+
+def save_not_found(db, domain: str):
+    """
+    Remember that the company API has no company for this domain.
+    """
+    domain = get_canonical_domain(domain)
+    failure = db.get(FailedDomainLookup, domain)
+    if failure is None:
+        failure = FailedDomainLookup(domain=domain)
+        db.add(failure)
+    failure.failed_at = datetime.utcnow()
+    _commit(db)
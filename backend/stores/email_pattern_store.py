@@ -0,0 +1,83 @@
+import os
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import EmailPattern
+from fixed_data.email_patterns import ALL_EMAIL_PATTERNS
+from utils.utils import get_canonical_domain, infer_email_pattern
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+EMAIL_PATTERN_TTL_DAYS = int(os.getenv("EMAIL_PATTERN_TTL_DAYS", "180"))
+
+
+def _commit(db):
+    try:
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"⚠️ Email pattern store write skipped: {e}", flush=True)
+
+
+def get_email_pattern(db, domain: str):
+    """
+    Return (pattern, mail_domain) learned for a company domain, or None when
+    there is none, it is stale, or it failed more often than it was confirmed.
+    """
+    record = db.get(EmailPattern, get_canonical_domain(domain))
+    if record is None or record.confirmed_count <= record.failed_count:
+        return None
+    if record.updated_at is None or datetime.utcnow() - record.updated_at >= timedelta(days=EMAIL_PATTERN_TTL_DAYS):
+        return None
+
+    return record.pattern, record.mail_domain
+
+
+def learn_email_pattern(db, domain: str, first_name: str, last_name: str, email: str):
+    """
+    Record a verified address of a lead at `domain`. The pattern it follows
+    is confirmed, or replaces the stored one if that one has been failing.
+    """
+    inferred = infer_email_pattern(email, first_name, last_name, ALL_EMAIL_PATTERNS)
+    if inferred is None:
+        return
+
+    pattern, mail_domain = inferred
+    domain = get_canonical_domain(domain)
+    record = db.get(EmailPattern, domain)
+
+    if record is None:
+        record = EmailPattern(domain=domain, pattern=pattern, mail_domain=mail_domain, confirmed_count=0, failed_count=0)
+        db.add(record)
+
+    if record.pattern == pattern and record.mail_domain == mail_domain:
+        record.confirmed_count += 1
+    elif record.confirmed_count <= record.failed_count:
+        record.pattern = pattern
+        record.mail_domain = mail_domain
+        record.confirmed_count = 1
+        record.failed_count = 0
+    else:
+        # Company uses several formats; count it against the stored one
+        record.failed_count += 1
+
+    record.updated_at = datetime.utcnow()
+    _commit(db)
+
+
+def record_email_pattern_miss(db, domain: str):
+    """
+    The address generated from the stored pattern did not verify.
+    """
+    record = db.get(EmailPattern, get_canonical_domain(domain))
+    if record is None:
+        return
+
+    record.failed_count += 1
+    record.updated_at = datetime.utcnow()
+    _commit(db)
@@ -0,0 +1,270 @@
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import SessionLocal, ProcessEntry, ProcessItem
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+# Item checkpoints held before they are committed together
+ITEM_CHECKPOINT_BATCH = int(os.getenv("ITEM_CHECKPOINT_BATCH", "20"))
+# ... or after this many seconds, whichever comes first
+ITEM_CHECKPOINT_SECONDS = float(os.getenv("ITEM_CHECKPOINT_SECONDS", "15"))
+# Items a worker leases at once
+ITEM_LEASE_BATCH = int(os.getenv("ITEM_LEASE_BATCH", "20"))
+# Times a worker selects candidates again when other workers took all it selected (SQLite)
+ITEM_CLAIM_ATTEMPTS = int(os.getenv("ITEM_CLAIM_ATTEMPTS", "5"))
+# A lease not renewed for this long is taken over by other workers (the holder is presumed dead)
+ITEM_LEASE_SECONDS = float(os.getenv("ITEM_LEASE_SECONDS", "300"))
+# How often a worker renews the leases it holds
+ITEM_LEASE_HEARTBEAT_SECONDS = float(os.getenv("ITEM_LEASE_HEARTBEAT_SECONDS", "60"))
+
+
+def _claimable(entry_id: str, now: datetime):
+    return and_(
+        ProcessItem.entry_id == entry_id,
+        ProcessItem.status != "processed",
+        or_(ProcessItem.lease_owner.is_(None), ProcessItem.lease_expires_at < now),
+    )
+
+
+def claim_items(db, entry_id: str, owner: str, limit: int = ITEM_LEASE_BATCH) -> Dict[str, Tuple[str, dict]]:
+    """
+    Lease up to `limit` unfinished items of the entry to `owner`.
+    Returns {item value: (status, result)} of the leased items.
+
+    On Postgres the candidates are locked with FOR UPDATE SKIP LOCKED, so
+    workers claiming at once get different items. SQLite has no row locks
+    (the clause is dropped); there the conditional UPDATE, run under SQLite's
+    database write lock, only takes items still free, and each worker reads
+    back what it actually got. A worker that lost every candidate to the
+    others selects again (up to ITEM_CLAIM_ATTEMPTS times); {} is returned
+    only when no item is left to claim.
+    """
+    now = datetime.utcnow()
+    lease = {
+        "lease_owner": owner,
+        "lease_expires_at": now + timedelta(seconds=ITEM_LEASE_SECONDS),
+        "heartbeat_at": now,
+    }
+
+    try:
+        for _ in range(max(1, ITEM_CLAIM_ATTEMPTS)):
+            ids = [
+                row.id for row in db.query(ProcessItem.id)
+                .filter(_claimable(entry_id, now))
+                .order_by(ProcessItem.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            ]
+            if not ids:
+                db.commit()
+                return {}
+
+            db.query(ProcessItem).filter(ProcessItem.id.in_(ids), _claimable(entry_id, now))\
+                .update(lease, synchronize_session=False)
+
+            # Other rows with the same value (duplicates in the sheet) go along, so a value is processed once
+            values = [row.value for row in db.query(ProcessItem.value).filter(ProcessItem.id.in_(ids), ProcessItem.lease_owner == owner)]
+            if values:
+                db.query(ProcessItem).filter(ProcessItem.value.in_(values), _claimable(entry_id, now))\
+                    .update(lease, synchronize_session=False)
+
+            db.commit()
+            if values:
+                break
+        else:
+            print(f"⚠️ Other workers took every item selected for entry {entry_id} {ITEM_CLAIM_ATTEMPTS} times in a row", flush=True)
+            return {}
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"⚠️ Could not lease items: {e}", flush=True)
+        return {}
+
+    items = db.query(ProcessItem)\
+        .filter(ProcessItem.entry_id == entry_id, ProcessItem.value.in_(values), ProcessItem.lease_owner == owner)\
+        .order_by(ProcessItem.id)
+
+    claimed = {}
+    for item in items:
+        claimed.setdefault(item.value, (item.status, dict(item.result or {})))
+    return claimed
+
+
+def renew_item_leases(db, entry_id: str, owner: str) -> int:
+    """
+    Extend the leases `owner` holds on unfinished items; returns how many.
+    """
+    now = datetime.utcnow()
+    try:
+        count = db.query(ProcessItem).filter(
+            ProcessItem.entry_id == entry_id,
+            ProcessItem.lease_owner == owner,
+            ProcessItem.status != "processed",
+        ).update(
+            {"lease_expires_at": now + timedelta(seconds=ITEM_LEASE_SECONDS), "heartbeat_at": now},
+            synchronize_session=False,
+        )
+        db.commit()
+        return count
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"⚠️ Item leases not renewed: {e}", flush=True)
+        return 0
+
+
+def release_item_leases(db, entry_id: str, owner: str):
+    """
+    Give back the unfinished items `owner` holds, for other workers or a resume.
+    """
+    try:
+        db.query(ProcessItem).filter(
+            ProcessItem.entry_id == entry_id,
+            ProcessItem.lease_owner == owner,
+            ProcessItem.status != "processed",
+        ).update({"lease_owner": None, "lease_expires_at": None}, synchronize_session=False)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"⚠️ Item leases not released: {e}", flush=True)
+
+
+def has_leased_items(db, entry_id: str, exclude_owner: Optional[str] = None) -> bool:
+    """
+    Whether other workers still hold live leases on unfinished items of the entry.
+    """
+    query = db.query(ProcessItem.id).filter(
+        ProcessItem.entry_id == entry_id,
+        ProcessItem.status != "processed",
+        ProcessItem.lease_owner.isnot(None),
+        ProcessItem.lease_expires_at >= datetime.utcnow(),
+    )
+    if exclude_owner is not None:
+        query = query.filter(ProcessItem.lease_owner != exclude_owner)
+    return query.first() is not None
+
+
+def has_claimable_items(db, entry_id: str) -> bool:
+    return db.query(ProcessItem.id).filter(_claimable(entry_id, datetime.utcnow())).first() is not None
+
+
+class LeaseHeartbeat:
+    """
+    Renews a worker's item leases every ITEM_LEASE_HEARTBEAT_SECONDS from a
+    background thread, so they hold while the run is blocked on a search.
+    """
+
+    def __init__(self, entry_id: str, owner: str, interval: float = ITEM_LEASE_HEARTBEAT_SECONDS):
+        self.entry_id = entry_id
+        self.owner = owner
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-heartbeat-{entry_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            db = SessionLocal()
+            try:
+                renew_item_leases(db, self.entry_id, self.owner)
+            finally:
+                db.close()
+
+
+class ItemCheckpoints:
+    """
+    Progress of each item (domain) of a run, saved to ProcessItem.status / result.
+
+    Statuses: "unprocessed" -> "enriched" (result["company"]) -> "searching"
+    (result["request_id"]) -> "processed" (result["leads"]). Items that are
+    written to the unsuitable tab before a search go straight to "processed".
+
+    Checkpoints are held and committed every ITEM_CHECKPOINT_BATCH items or
+    ITEM_CHECKPOINT_SECONDS. `before_commit` (the sheet flush) runs first, so
+    an item is never saved as processed while its rows are still buffered.
+
+    With an `owner`, only items still leased to it are written. Suitable leads
+    of processed items are added to ProcessEntry.suitable_count in the same
+    commit, and the total (all workers and runs) is read back into
+    `entry_suitable_count`.
+    """
+
+    def __init__(self, db, entry_id: str, owner: Optional[str] = None, before_commit: Optional[Callable[[], None]] = None):
+        self.db = db
+        self.entry_id = entry_id
+        self.owner = owner
+        self.before_commit = before_commit
+        self._results: Dict[str, dict] = {}
+        self._pending: Dict[str, str] = {}
+        self._flushed_at = time.monotonic()
+        self.suitable_flushed = 0
+        self.entry_suitable_count = db.query(ProcessEntry.suitable_count).filter_by(id=entry_id).scalar() or 0
+
+    def restore(self, value: str, result: dict):
+        """
+        Start from what an earlier run saved for the item.
+        """
+        self._results[value] = dict(result)
+
+    def mark(self, value: str, status: str, **result):
+        """
+        Set the item's status and add `result` to what is saved for it.
+        """
+        self._results.setdefault(value, {}).update(result)
+        self._pending[value] = status
+
+        if len(self._pending) >= ITEM_CHECKPOINT_BATCH or time.monotonic() - self._flushed_at >= ITEM_CHECKPOINT_SECONDS:
+            self.flush()
+
+    def flush(self):
+        """
+        Commit the held checkpoints.
+        """
+        self._flushed_at = time.monotonic()
+        if not self._pending:
+            return
+
+        if self.before_commit:
+            self.before_commit()
+
+        try:
+            suitable = 0
+            for value, status in self._pending.items():
+                query = self.db.query(ProcessItem).filter(
+                    ProcessItem.entry_id == self.entry_id,
+                    ProcessItem.value == value,
+                    ProcessItem.status != "processed",
+                )
+                if self.owner is not None:
+                    query = query.filter(ProcessItem.lease_owner == self.owner)
+
+                result = self._results.get(value, {})
+                updated = query.update({"status": status, "result": result}, synchronize_session=False)
+                if updated and status == "processed":
+                    suitable += (result.get("leads") or {}).get("suitable", 0)
+
+            if suitable:
+                self.db.query(ProcessEntry).filter_by(id=self.entry_id)\
+                    .update({"suitable_count": ProcessEntry.suitable_count + suitable}, synchronize_session=False)
+
+            self.db.commit()
+            self._pending.clear()
+            self.suitable_flushed += suitable
+            self.entry_suitable_count = self.db.query(ProcessEntry.suitable_count).filter_by(id=self.entry_id).scalar() or 0
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            print(f"⚠️ Item checkpoints not saved: {e}", flush=True)
@@ -0,0 +1,39 @@
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import EntryMetric
+from core.metrics import get_entry_counters, pop_entry_counters
+
+
+def save_entry_metrics(db, entry_id: str):
+    """
+    Add the counters of the run that just ended to the entry's saved metrics.
+    """
+    counters = pop_entry_counters(entry_id)
+
+    try:
+        for name, value in counters.items():
+            metric = db.get(EntryMetric, (entry_id, name))
+            if metric is None:
+                metric = EntryMetric(entry_id=entry_id, name=name, value=0)
+                db.add(metric)
+            metric.value += value
+
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"⚠️ Entry metrics not saved: {e}", flush=True)
+
+    if counters:
+        print(f"📈 Entry {entry_id} metrics: {counters}", flush=True)
+
+
+def get_entry_metrics(db, entry_id: str) -> dict:
+    """
+    Saved metrics of an entry plus those of a run still in progress.
+    """
+    metrics = {metric.name: metric.value for metric in db.query(EntryMetric).filter_by(entry_id=entry_id)}
+
+    for name, value in get_entry_counters(entry_id).items():
+        metrics[name] = metrics.get(name, 0) + value
+
+    return metrics
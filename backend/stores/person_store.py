@@ -0,0 +1,121 @@
+import os
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import PersonRecord
+from utils.utils import get_canonical_domain, get_canonical_linkedin_url, get_email_name_part
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+PERSON_EMAIL_TTL_DAYS = int(os.getenv("PERSON_EMAIL_TTL_DAYS", "90"))
+# Shorter, since the finder's coverage grows
+PERSON_EMAIL_NOT_FOUND_TTL_DAYS = int(os.getenv("PERSON_EMAIL_NOT_FOUND_TTL_DAYS", "14"))
+PERSON_VERIFY_TTL_DAYS = int(os.getenv("PERSON_VERIFY_TTL_DAYS", "30"))
+PERSON_ACTIVITY_TTL_DAYS = int(os.getenv("PERSON_ACTIVITY_TTL_DAYS", "7"))
+
+
+def _is_fresh(fetched_at, ttl_days: int) -> bool:
+    return fetched_at is not None and datetime.utcnow() - fetched_at < timedelta(days=ttl_days)
+
+
+def _person_key(person: dict):
+    return (
+        get_canonical_linkedin_url(person.get("linkedin_url")),
+        get_email_name_part(person.get("first_name", "")),
+        get_email_name_part(person.get("last_name", "")),
+        get_canonical_domain(person.get("domain") or ""),
+    )
+
+
+def _find_record(db, person: dict):
+    linkedin_url, first_name, last_name, domain = _person_key(person)
+
+    if linkedin_url:
+        record = db.query(PersonRecord).filter_by(linkedin_url=linkedin_url).first()
+        if record is not None:
+            return record
+
+    if not first_name or not last_name or not domain:
+        return None
+
+    for record in db.query(PersonRecord).filter_by(first_name=first_name, last_name=last_name, domain=domain):
+        # Same name at the same company but another profile is another person
+        if not linkedin_url or not record.linkedin_url or record.linkedin_url == linkedin_url:
+            return record
+
+    return None
+
+
+def get_cached_person(db, person: dict) -> dict:
+    """
+    Fresh parts of what is stored for a lead:
+    "email" (None if it was searched and not found), "email_status" and "last_activity".
+    A part that is missing or stale is left out.
+    """
+    record = _find_record(db, person)
+    if record is None:
+        return {}
+
+    cached = {}
+
+    if record.email and _is_fresh(record.email_found_at, PERSON_EMAIL_TTL_DAYS):
+        cached["email"] = record.email
+        if record.email_status and _is_fresh(record.verified_at, PERSON_VERIFY_TTL_DAYS):
+            cached["email_status"] = record.email_status
+    elif not record.email and _is_fresh(record.email_found_at, PERSON_EMAIL_NOT_FOUND_TTL_DAYS):
+        cached["email"] = None
+
+    if record.last_activity and _is_fresh(record.activity_at, PERSON_ACTIVITY_TTL_DAYS):
+        cached["last_activity"] = record.last_activity
+
+    return cached
+
+
+def save_person(db, person: dict, lead_email: dict):
+    """
+    Store the parts of a lead's email check (see enrichment.check_lead_email)
+    that were fetched rather than taken from the cache.
+    """
+    fetched = lead_email["fetched"]
+    if not any(fetched.values()):
+        return
+
+    linkedin_url, first_name, last_name, domain = _person_key(person)
+    if not first_name or not last_name or not domain:
+        return
+
+    record = _find_record(db, person)
+    if record is None:
+        record = PersonRecord(first_name=first_name, last_name=last_name, domain=domain)
+        db.add(record)
+    if linkedin_url and not record.linkedin_url:
+        record.linkedin_url = linkedin_url
+
+    now = datetime.utcnow()
+    email = lead_email["email"] if lead_email["email"] != "-" else None
+
+    if fetched["email"]:
+        if email != record.email:
+            record.email_status, record.verified_at = None, None
+        record.email = email
+        record.email_found_at = now
+
+    if fetched["verify"] and lead_email["verify_status"]:
+        record.email_status = lead_email["verify_status"]
+        record.verified_at = now
+
+    profile_activity = lead_email["profile_activity"]
+    if fetched["activity"] and isinstance(profile_activity, dict):
+        record.last_activity = profile_activity.get("recent_activity_time", "-")
+        record.activity_at = now
+
+    try:
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"⚠️ Person store write skipped: {e}", flush=True)
@@ -0,0 +1,86 @@
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import PendingSearch
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+# How long a submitted search_leads request_id can still be waited for
+SEARCH_REATTACH_MAX_AGE_HOURS = float(os.getenv("SEARCH_REATTACH_MAX_AGE_HOURS", "24"))
+
+
+def save_pending_search(db, entry_id: str, request_id, company_ids, filters: dict, api_key_id: Optional[str] = None):
+    """
+    Record a submitted search until its results are processed.
+    `api_key_id` identifies the pooled key it was submitted with.
+    """
+    record = db.get(PendingSearch, str(request_id))
+    if record is None:
+        record = PendingSearch(request_id=str(request_id), entry_id=entry_id)
+        db.add(record)
+    record.company_ids = list(company_ids)
+    record.filters = filters
+    record.api_key_id = api_key_id
+    record.submitted_at = datetime.utcnow()
+
+    try:
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"⚠️ Pending search not saved: {e}", flush=True)
+
+
+def get_pending_searches(db, entry_id: str) -> List[dict]:
+    """
+    The entry's searches that are recent enough to be waited for again, oldest first.
+    """
+    oldest = datetime.utcnow() - timedelta(hours=SEARCH_REATTACH_MAX_AGE_HOURS)
+    records = db.query(PendingSearch).filter(
+        PendingSearch.entry_id == entry_id,
+        PendingSearch.submitted_at > oldest,
+    ).order_by(PendingSearch.submitted_at).all()
+
+    return [
+        {
+            "request_id": record.request_id,
+            "company_ids": record.company_ids,
+            "filters": record.filters,
+            "api_key_id": record.api_key_id,
+            "submitted_at": record.submitted_at,
+        }
+        for record in records
+    ]
+
+
+def delete_pending_search(db, request_id):
+    """
+    Forget a search once its results are processed.
+    """
+    try:
+        db.query(PendingSearch).filter_by(request_id=str(request_id)).delete(synchronize_session=False)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"⚠️ Pending search not removed: {e}", flush=True)
+
+
+def delete_expired_pending_searches(db) -> int:
+    """
+    Drop searches too old to be waited for; returns how many were dropped.
+    """
+    oldest = datetime.utcnow() - timedelta(hours=SEARCH_REATTACH_MAX_AGE_HOURS)
+    try:
+        count = db.query(PendingSearch).filter(PendingSearch.submitted_at <= oldest).delete(synchronize_session=False)
+        db.commit()
+        return count
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"⚠️ Expired pending searches not removed: {e}", flush=True)
+        return 0
@@ -0,0 +1,50 @@
+import os
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import CatchAllDomain
+from utils.utils import get_canonical_domain
+
+
+# Load .env variables
+load_dotenv()
+
+# CONFIG
+CATCH_ALL_TTL_DAYS = int(os.getenv("CATCH_ALL_TTL_DAYS", "30"))
+
+
+def get_catch_all_domains(db, domains) -> set:
+    """
+    The ones among `domains` recently verified as catch-all.
+    """
+    canonical = {get_canonical_domain(domain) for domain in domains if domain}
+    if not canonical:
+        return set()
+
+    oldest = datetime.utcnow() - timedelta(days=CATCH_ALL_TTL_DAYS)
+    rows = db.query(CatchAllDomain.domain).filter(
+        CatchAllDomain.domain.in_(canonical),
+        CatchAllDomain.checked_at > oldest,
+    ).all()
+
+    return {row.domain for row in rows}
+
+
+def save_catch_all_domain(db, domain: str):
+    """
+    Remember that every address at this domain verifies as accept_all.
+    """
+    domain = get_canonical_domain(domain)
+    record = db.get(CatchAllDomain, domain)
+    if record is None:
+        record = CatchAllDomain(domain=domain)
+        db.add(record)
+    record.checked_at = datetime.utcnow()
+
+    try:
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"⚠️ Catch-all store write skipped: {e}", flush=True)
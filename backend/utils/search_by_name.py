@@ -6,9 +6,10 @@ from rapidfuzz import fuzz, process
 from api_calls import get_company_info_from_prooflink
 import re
 import os
+from core.key_pool import get_env_key
 
 
-RAPIDAPI_KEY_VERIFY = os.getenv("RAPIDAPI_KEY_VERIFY")
+RAPIDAPI_KEY_VERIFY = get_env_key("RAPIDAPI_KEY_VERIFY")
 
 def get_company_info_from_names(company_names, country_names):
     """
@@ -22,7 +23,11 @@ def get_company_info_from_names(company_names, country_names):
         country_code = country_codes.get(country_name, "us") if country_name else "us"   
         country_code = get_country_code(country_name)    
         response = get_search_results_by_serper(company_name, location=country_code)
-        response_data = json.loads(response)
+        try:
+            response_data = json.loads(response) if response else {}
+        except ValueError:
+            print(f"❌ Invalid JSON in company search response for '{company_name}'", flush=True)
+            response_data = {}
 
         if "organic" in response_data:
             best_match = None
@@ -2,6 +2,7 @@ from fixed_data.sizes import SIZE_RANGES
 from urllib.parse import urlparse
 import re
 import math
+import unicodedata
 import json
 from fixed_data.levels import all_job_levels, job_level_seniority, equal_levels_map
 
@@ -254,6 +255,41 @@ def get_clean_domain(raw):
     return domain
 
 
+def get_canonical_domain(raw):
+    """
+    Canonical form of a domain, used as the key for cached company data.
+    """
+    domain = get_clean_domain(raw.strip().lower())
+    domain = domain.split(":")[0].rstrip("./")
+
+    return domain
+
+
+def get_canonical_linkedin_url(raw):
+    """
+    Canonical form of a Linkedin profile url ("linkedin.com/in/<slug>"), used as a cache key.
+    Returns None for empty or placeholder values.
+    """
+    if not raw or raw.strip() in ("-", ""):
+        return None
+
+    url = raw.strip().lower()
+    if not url.startswith(("http://", "https://")):
+        url = "https://" + url
+
+    parsed = urlparse(url)
+    host = parsed.netloc.split(":")[0]
+    # Country subdomains (uk.linkedin.com) point to the same profile
+    if host.endswith("linkedin.com"):
+        host = "linkedin.com"
+
+    path = parsed.path.rstrip("/")
+    if not path:
+        return None
+
+    return f"{host}{path}"
+
+
 # /////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
 # //////////////////////////////////////////////////// Define levels //////////////////////////////////////////////////////////////
 # /////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
@@ -485,3 +521,47 @@ def same_word(a: str, b: str) -> bool:
     normalize = lambda s: s.lower().replace(".", "").replace(" ", "")
     return normalize(a) == normalize(b)
 
+
+# /////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+# //////////////////////////////////////////////////// Email patterns /////////////////////////////////////////////////////////////
+# /////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
+
+def get_email_name_part(name: str) -> str:
+    """
+    Name as it appears in an email address: lowercase ascii letters and digits only.
+    """
+    name = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def generate_email_candidates(first_name: str, last_name: str, domain: str, patterns):
+    """
+    Addresses built from the local-part templates in `patterns`, in order and without duplicates.
+    """
+    fn = get_email_name_part(first_name)
+    ln = get_email_name_part(last_name)
+    domain = (domain or "").strip().lower()
+
+    if not fn or not ln or not domain:
+        return []
+
+    candidates = [f"{pattern.format(fn=fn, ln=ln, fi=fn[0], li=ln[0])}@{domain}" for pattern in patterns]
+
+    return list(dict.fromkeys(candidates))
+
+
+def infer_email_pattern(email: str, first_name: str, last_name: str, patterns):
+    """
+    Template from `patterns` that builds this lead's address.
+    Returns (pattern, mail domain), or None when no template matches.
+    """
+    local_part, _, mail_domain = (email or "").strip().lower().partition("@")
+    if not local_part or not mail_domain:
+        return None
+
+    for pattern in patterns:
+        candidates = generate_email_candidates(first_name, last_name, mail_domain, [pattern])
+        if candidates and candidates[0] == f"{local_part}@{mail_domain}":
+            return pattern, mail_domain
+
+    return None